@@ -0,0 +1,90 @@
+# analysis_service.py (Reset Security - AI 분석 요청 게이트)
+# Streamlit 앱(app.py)과 정적 설문 API(api.py)가 같은 기준으로 AI 분석을 처리하도록
+# "최근 결과 재사용 → 자동화/할당량 판별 → 동일 설문 병합 실행 → 성공 결과 캐시" 흐름을 한곳에 둡니다.
+from concurrent.futures import Future
+
+import engine
+from quota import is_probable_bot
+from singleflight import SingleFlight
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+DEFAULT_MIN_FILL_SEC = 15  # 설문 시작~제출 최소 소요 시간 (이보다 빠르면 자동화 의심)
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _log_cache_failure(future):
+    if future.exception():
+        print(f"Report cache 저장 실패: {future.exception()}")
+
+
+# ---------------------------------------
+# 1. 게이트 및 실행
+# ---------------------------------------
+class AnalysisService:
+    """AI 분석 요청 1건을 캐시/할당량 기준으로 거른 뒤, 공용 I/O 엔진에서 병합 실행합니다.
+
+    submit()은 항상 concurrent.futures.Future를 반환합니다. 캐시된 결과나 할당량 초과 시의 점수 기반
+    리포트는 이미 완료된 Future이므로, 호출 측은 지연 예산 처리만 한 가지 방식으로 하면 됩니다.
+    """
+
+    def __init__(self, io_engine, report_cache, quota, min_fill_sec=DEFAULT_MIN_FILL_SEC):
+        self.io_engine = io_engine
+        self.report_cache = report_cache
+        self.quota = quota
+        self.min_fill_sec = min_fill_sec
+        self.flight = SingleFlight("analysis")
+
+    def check_visitor(self, visitor):
+        """LLM 분석 허용이면 None, 차단이면 사유 ("bot_filtered"/"throttled").
+
+        visitor: {"key": quota.visitor_key 결과, "user_agent": User-Agent (확인할 수 없으면 None),
+                  "fill_sec": 서버 기준 설문 소요 시간}
+        """
+        user_agent = visitor.get("user_agent")
+        # 헤더를 확인할 수 없는 환경(테스트 등)에서는 User-Agent 검사를 생략
+        if user_agent is not None and is_probable_bot(user_agent):
+            return "bot_filtered"
+        if visitor.get("fill_sec", 0) < self.min_fill_sec:
+            return "bot_filtered"  # 5단계 설문을 사람이 불가능한 속도로 완료
+        if not self.quota.try_acquire(visitor["key"]):
+            return "throttled"
+        return None
+
+    def submit(self, vault_hash, score, visitor, analyze, llm_enabled=True):
+        """analyze: AI 분석 코루틴을 만드는 함수 (예: lambda: engine.perform_ai_analysis_async(...)).
+
+        llm_enabled가 False(모델 미설정)이면 캐시/할당량 없이 analyze의 폴백 결과를 그대로 사용합니다.
+        """
+        def gate():
+            blocked = self.check_visitor(visitor)
+            if not blocked:
+                return None
+            # 할당량 초과 또는 자동화 의심: LLM 호출 없이 점수 기반 리포트 제공
+            self.quota.incr(blocked)
+            self.quota.incr("served_local")
+            return engine.build_limited_report(score)
+
+        if llm_enabled:
+            cached = self.report_cache.get(vault_hash)
+            if cached:
+                # 같은 설문의 최근 AI 결과 재사용 (재제출/새로고침, 할당량 차감 없음)
+                self.quota.incr("served_cached")
+                return _completed(cached)
+        # 더블 클릭/새로고침/다중 탭으로 같은 설문이 동시에 들어와도 LLM 호출은 1회만 실행하며,
+        # 할당량은 실제로 실행하는 첫 요청(leader)만 차감 (진행 중인 분석에 합류하면 차감 없음)
+        return self.flight.submit(vault_hash, lambda: self._analyze_and_cache(vault_hash, analyze), self.io_engine,
+                                  gate=gate if llm_enabled else None)
+
+    async def _analyze_and_cache(self, vault_hash, analyze):
+        """AI 분석을 실행하고 성공 결과를 리포트 캐시에 저장합니다. (지연 예산 초과 후 완료분 포함)"""
+        result = await analyze()
+        # 캐시 쓰기(SQLite)는 블로킹 풀에서 따로 진행하고 결과는 바로 반환 (풀이 밀려도 리포트가 늦어지지 않음)
+        self.io_engine.offload(self.report_cache.put, vault_hash, result).add_done_callback(_log_cache_failure)
+        return result
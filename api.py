@@ -0,0 +1,212 @@
+# api.py (Reset Security - 정적 설문 페이지용 분석 API)
+#
+# 실행: uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+#
+# 정적 설문 페이지(index.html)는 GET /api/questions로 설문 정의와 서명된 시작 시각을 받아 5단계를
+# 브라우저에서만 진행하고, 제출 시 1회 POST /api/analyze를 호출합니다. 분석은 app.py와 같은 게이트
+# (analysis_service.py)를 거치며, 지연 예산(ANALYSIS_DEADLINE_SEC) 안에 끝나지 않으면 제출을 'pending'으로
+# 저장한 채 바로 리포트 주소를 돌려줍니다. Streamlit 리포트(?report=<token>)는 GET /api/report/<token>을
+# 조회하며, 분석이 끝날 때까지 주기적으로 다시 조회합니다. (두 서비스가 디스크를 공유할 필요 없음)
+#
+# 환경 변수: GOOGLE_API_KEY, REPORT_APP_URL(Streamlit 주소), RESET_API_ALLOWED_ORIGINS(쉼표 구분),
+#           RESET_API_SECRET(시작 시각 서명 키, 워커/재시작 간 공유), QUOTA_CAPACITY, QUOTA_REFILL_PER_HOUR,
+#           MIN_FILL_SEC, ANALYSIS_DEADLINE_SEC, RESET_TRUSTED_PROXY_HOPS(앞단 리버스 프록시 수, 기본 1)
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import engine
+import metrics
+from analysis_service import AnalysisService
+from async_io import AsyncEngine
+from questionnaire import QUESTION_STEPS, validate_answers
+from quota import VisitorQuota, visitor_key
+from report_cache import ReportCache, SubmissionStore
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+REPORT_APP_URL = os.environ.get("REPORT_APP_URL", "https://imdmiracle.streamlit.app")
+ALLOWED_ORIGINS = [o.strip() for o in os.environ.get(
+    "RESET_API_ALLOWED_ORIGINS", "https://www.resetsecurity.co.kr,https://resetsecurity.co.kr").split(",") if o.strip()]
+QUOTA_CAPACITY = float(os.environ.get("QUOTA_CAPACITY", 3))
+QUOTA_REFILL_PER_HOUR = float(os.environ.get("QUOTA_REFILL_PER_HOUR", 6))
+MIN_FILL_SEC = float(os.environ.get("MIN_FILL_SEC", 15))
+# AI 분석 지연 예산 (초): 초과 시 리포트 주소를 먼저 돌려주고 결과는 완료 후 제출에 반영 (app.py와 동일 기준)
+ANALYSIS_DEADLINE_SEC = float(os.environ.get("ANALYSIS_DEADLINE_SEC", 4.0))
+MAX_BODY_BYTES = 16 * 1024
+MAX_FORM_AGE_SEC = 2 * 3600  # 시작 시각 토큰 유효 시간 (5단계 설문은 몇 분이면 끝남, 제출 1회에만 사용 가능)
+REPORT_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+API_SECRET = os.environ.get("RESET_API_SECRET", "").encode("utf-8")
+if not API_SECRET:
+    # 워커마다 키가 달라지므로, 다른 워커에서 발급된 시작 시각은 검증에 실패하여 점수 기반 리포트로 처리됨
+    print("RESET_API_SECRET is not set: using a per-process key (set it when running more than one worker)")
+    API_SECRET = secrets.token_bytes(32)
+
+_state = {"model": None, "io_engine": None, "analysis": None, "submissions": None}
+
+
+# ---------------------------------------
+# 1. 설문 시작 시각 (서버 서명)
+# ---------------------------------------
+def _sign(value):
+    return hmac.new(API_SECRET, value.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_start_token(now=None):
+    """설문 정의와 함께 내려주는 시작 시각 토큰 ("<unix time>.<서명>")."""
+    issued = str(int(now if now is not None else time.time()))
+    return f"{issued}.{_sign(issued)}"
+
+
+def fill_seconds(token, now=None):
+    """시작 시각 토큰으로 서버 기준 설문 소요 시간을 계산합니다. 위조/만료/누락이면 0. (재사용 여부는 analyze에서 확인)"""
+    issued, _, signature = str(token or "").partition(".")
+    if not issued.isdigit() or not hmac.compare_digest(signature, _sign(issued)):
+        return 0.0
+    elapsed = (now if now is not None else time.time()) - int(issued)
+    return elapsed if 0 <= elapsed <= MAX_FORM_AGE_SEC else 0.0
+
+
+# ---------------------------------------
+# 2. 분석
+# ---------------------------------------
+def complete_submission(token, score, future):
+    """지연 예산 후 끝난 분석 결과를 pending 제출에 반영합니다. (I/O 엔진 루프에서 호출됨)"""
+    try:
+        result = future.result()
+        metrics.incr("analysis.upgrade_failed" if result.get("fallback") else "analysis.upgraded")
+    except Exception as e:
+        print(f"AI Analysis Error (background): {e}")
+        metrics.incr("analysis.upgrade_failed")
+        result = {"fallback": True, "calculated_score": score}
+    # SQLite 쓰기는 이벤트 루프 밖에서
+    _state["io_engine"].offload(_state["submissions"].complete, token, result)
+
+
+async def analyze(request):
+    """POST /api/analyze {"answers": {...}, "started": GET /api/questions의 시작 시각 토큰} → 리포트 주소"""
+    body = await request.body()
+    if len(body) > MAX_BODY_BYTES:
+        return JSONResponse({"error": "request too large"}, status_code=413)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return JSONResponse({"error": "invalid JSON"}, status_code=400)
+    if not isinstance(payload, dict):
+        return JSONResponse({"error": "invalid JSON"}, status_code=400)
+    answers, errors = validate_answers(payload.get("answers"))
+    if errors:
+        return JSONResponse({"error": "invalid answers", "details": errors}, status_code=400)
+
+    metrics.incr("api.analyze")
+    vault_info = engine.process_and_vault_questionnaire(answers)
+    score = engine.calculate_base_score(answers)
+    visitor = {
+        "key": visitor_key(request.headers, request.client.host if request.client else None),
+        "user_agent": request.headers.get("User-Agent", ""),
+        "fill_sec": fill_seconds(payload.get("started")),
+    }
+    # 같은 시작 시각 토큰을 재사용한 제출은 소요 시간을 인정하지 않음 (서명이 유효한 토큰만 기록)
+    if visitor["fill_sec"] and not await run_in_threadpool(_state["submissions"].claim_start, payload["started"]):
+        metrics.incr("api.start_token_reused")
+        visitor["fill_sec"] = 0.0
+    model = _state["model"]
+    # 캐시/할당량 조회는 SQLite 잠금 대기가 있을 수 있으므로 스레드 풀에서
+    future = await run_in_threadpool(
+        _state["analysis"].submit, vault_info["hash"], score, visitor,
+        lambda: engine.perform_ai_analysis_async(engine.SERVICE_TYPE, engine.build_dossier_info(answers), answers, score, model=model),
+        model is not None,
+    )
+
+    pending = False
+    served_immediately = future.done()
+    try:
+        result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), ANALYSIS_DEADLINE_SEC)
+        if not served_immediately:
+            metrics.incr("analysis.within_deadline")
+    except asyncio.TimeoutError:
+        # 지연 예산 초과: 리포트는 점수 기반으로 먼저 열고, 분석이 끝나면 제출을 갱신
+        metrics.incr("analysis.deadline_exceeded")
+        result = {"fallback": True, "calculated_score": score}
+        pending = True
+    except Exception as e:
+        print(f"AI Analysis Error: {e}")
+        result = {"fallback": True, "calculated_score": score}
+
+    token = await run_in_threadpool(_state["submissions"].create, vault_info, answers, score, result, pending)
+    if pending:
+        future.add_done_callback(lambda f: complete_submission(token, score, f))
+
+    level, _ = engine.get_risk_level_korean(score)
+    return JSONResponse({
+        "report_token": token,
+        "status": "pending" if pending else "done",
+        "score": score,
+        "risk_level": level,
+        "report_url": f"{REPORT_APP_URL}/?embed=true&report={token}",
+    })
+
+
+async def report(request):
+    """GET /api/report/<token> → 제출 응답/점수/결과 (Streamlit 리포트가 조회, pending이면 재조회)"""
+    token = request.path_params["token"]
+    if not REPORT_TOKEN_PATTERN.match(token):
+        return JSONResponse({"error": "not found"}, status_code=404)
+    submission = await run_in_threadpool(_state["submissions"].get, token)
+    if not submission:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    return JSONResponse(submission, headers={"Cache-Control": "no-store"})
+
+
+async def questions(request):
+    """GET /api/questions → 설문 정의 (index.html이 렌더링) + 서명된 시작 시각"""
+    return JSONResponse({"steps": QUESTION_STEPS, "started": issue_start_token()}, headers={"Cache-Control": "no-store"})
+
+
+# ---------------------------------------
+# 3. 앱
+# ---------------------------------------
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if api_key:
+        try:
+            _state["model"] = engine.init_model(api_key)
+        except Exception as e:
+            print(f"AI Model Initialization Failed: {e}")
+    # Gemini 비동기 클라이언트는 처음 사용한 루프에 묶이므로, 분석은 요청 루프가 아닌 공용 I/O 엔진에서 실행
+    _state["io_engine"] = AsyncEngine()
+    _state["analysis"] = AnalysisService(
+        _state["io_engine"], ReportCache(),
+        VisitorQuota(capacity=QUOTA_CAPACITY, refill_per_hour=QUOTA_REFILL_PER_HOUR),
+        min_fill_sec=MIN_FILL_SEC,
+    )
+    _state["submissions"] = SubmissionStore()
+    yield
+    _state["io_engine"].shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/questions", questions, methods=["GET"]),
+        Route("/api/analyze", analyze, methods=["POST"]),
+        Route("/api/report/{token}", report, methods=["GET"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=ALLOWED_ORIGINS, allow_methods=["GET", "POST"], allow_headers=["Content-Type"])],
+    lifespan=lifespan,
+)
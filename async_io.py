@@ -0,0 +1,97 @@
+# async_io.py (Reset Security - 프로세스 공용 비동기 I/O 엔진)
+# 모든 외부 호출(Gemini, HTTP, Google Sheets)을 프로세스당 1개의 백그라운드 이벤트 루프에서 처리합니다.
+# Streamlit 스크립트 스레드는 작업을 제출하고 concurrent.futures.Future를 지연 예산 안에서 기다립니다.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+# 비동기 클라이언트가 없는 블로킹 호출(gspread, requests)용 스레드 수 상한
+BLOCKING_WORKERS = 4
+# Google Sheets(gspread) 전용 스레드 수: 느린 시트 호출이 HTTP/캐시 쓰기용 풀을 점유하지 않도록 분리
+SHEETS_WORKERS = 2
+HTTP_POOL_SIZE = 8
+
+
+# ---------------------------------------
+# 1. 이벤트 루프 엔진
+# ---------------------------------------
+class AsyncEngine:
+    """백그라운드 스레드 1개에서 asyncio 이벤트 루프를 실행합니다.
+
+    Gemini 비동기 클라이언트(gRPC aio)는 처음 사용한 루프에 묶이므로, 스크립트 실행마다 새 루프를
+    만들지 않고 프로세스 전체가 이 루프 하나를 공유합니다. submit(fn, *args)는 Executor와 같은
+    형태라 SingleFlight.submit에 그대로 넘길 수 있습니다.
+    """
+
+    def __init__(self, blocking_workers=BLOCKING_WORKERS, sheets_workers=SHEETS_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-io", daemon=True)
+        self._thread.start()
+        self._blocking = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix="async-io-blocking")
+        self.loop.set_default_executor(self._blocking)
+        self._sheets = ThreadPoolExecutor(max_workers=sheets_workers, thread_name_prefix="async-io-sheets")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        # 연결 재사용 HTTP 세션 (블로킹 풀 크기만큼 keep-alive 연결 유지)
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _track(self, future):
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._untrack)
+        return future
+
+    def _untrack(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """코루틴 함수 fn(*args)를 루프에서 실행하고 concurrent.futures.Future를 반환합니다."""
+        metrics.incr("async_io.submitted")
+        return self._track(asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), self.loop))
+
+    def run(self, coro, timeout=None):
+        """코루틴을 루프에서 실행하고 결과를 기다립니다. 시간 초과 시 작업을 취소하고 TimeoutError."""
+        future = self._track(asyncio.run_coroutine_threadsafe(coro, self.loop))
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def offload(self, fn, *args):
+        """비동기 클라이언트가 없는 블로킹 호출을 제한된 스레드 풀에서 실행합니다. (결과를 기다리지 않아도 됨)"""
+        metrics.incr("async_io.offloaded")
+        return self._track(self._blocking.submit(fn, *args))
+
+    def offload_sheets(self, fn, *args):
+        """Google Sheets 호출을 전용 스레드 풀에서 실행합니다. (시트 지연이 다른 블로킹 호출을 막지 않음)"""
+        metrics.incr("async_io.offloaded_sheets")
+        return self._track(self._sheets.submit(fn, *args))
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._blocking.shutdown(wait=False)
+        self._sheets.shutdown(wait=False)
+        self.http.close()
+
@@ -0,0 +1,295 @@
+# batch_runner.py (Reset Security - 설문 JSONL 일괄 분석기)
+#
+# 사용법:
+#   python batch_runner.py answers.jsonl -o reports.jsonl --workers 4 --rate 2
+#   python batch_runner.py answers.jsonl --fake-model            # 오프라인 실행 (Gemini 호출 없음)
+#
+# 입력: 한 줄에 설문 응답(dict) 1건인 JSONL (app.py의 st.session_state.answers와 같은 키)
+# 출력: 한 줄에 리포트 1건인 JSONL. 출력 파일이 곧 체크포인트이며, 중단 후 같은 명령으로
+#       다시 실행하면 status가 "ok"인 건(vault hash 기준)은 건너뛰고 나머지만 재처리합니다.
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import engine
+
+# ---------------------------------------
+# 0. 기본 설정
+# ---------------------------------------
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 1.0        # 초당 LLM 호출 수 (전체 워커 합산)
+DEFAULT_AGENCIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agencies.json")
+STATS_INTERVAL = 2.0
+
+
+# ---------------------------------------
+# 1. 호출 속도 제한 (토큰 버킷)
+# ---------------------------------------
+class RateLimiter:
+    """초당 rate회로 호출을 제한하는 스레드 안전 토큰 버킷입니다."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_sec = (1 - self.tokens) / self.rate
+            time.sleep(wait_sec)
+
+
+class RateLimitedModel:
+    """generate_content 호출마다 토큰을 소비하는 모델 래퍼입니다."""
+
+    def __init__(self, model, limiter):
+        self.model = model
+        self.limiter = limiter
+        self.model_name = getattr(model, "model_name", "")
+
+    def generate_content(self, *args, **kwargs):
+        self.limiter.acquire()
+        return self.model.generate_content(*args, **kwargs)
+
+
+# ---------------------------------------
+# 2. 오프라인용 가짜 모델
+# ---------------------------------------
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, prompt=""):
+        self.text = text
+        # 한글 기준 대략 2자당 1토큰으로 추정
+        self.usage_metadata = FakeUsage(len(prompt) // 2, len(text) // 2)
+
+
+class FakeGeminiModel:
+    """Gemini 응답 형식을 흉내 내는 오프라인 모델 (지연/오류율 조절 가능)."""
+
+    def __init__(self, latency=0.3, error_rate=0.0, model_name=engine.MODEL_NAME):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None):
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        return self._respond(contents)
+
+    async def generate_content_async(self, contents, generation_config=None, safety_settings=None):
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        return self._respond(contents)
+
+    def _respond(self, contents):
+        prompt = contents[0] if isinstance(contents, list) else contents
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake model error")
+
+        partner_names = re.findall(r"- 업체명: (.+)", prompt)
+        if partner_names:
+            reasons = {name: "(fake) 부족한 증거 확보에 특화된 업체입니다." for name in partner_names}
+            return FakeResponse(json.dumps(reasons, ensure_ascii=False), prompt)
+
+        score_match = re.search(r"사전 계산된 위험 신호 점수: (\d+)점", prompt)
+        score = int(score_match.group(1)) if score_match else 50
+        report = {
+            "risk_assessment": {"summary": "(fake) 설문 응답 기반 분석 결과입니다."},
+            "deep_analysis": {f"pattern{i}_{k}": f"(fake) {k} {i}" for i in (1, 2, 3) for k in ("title", "analysis")},
+            "litigation_readiness": {"suspicion_score": score, "evidence_score": 5, "warning": "(fake) 증거 확보 필요", "needed_evidence": ["(fake) 차량 이동 기록"]},
+            "golden_time": {"urgency_message": "(fake) 시간이 중요합니다."},
+            "the_dossier": {"profile": "(fake) 프로파일", "negotiation_strategy": "(fake) 전략"},
+            "the_war_room": {f"step{i}_{k}": f"(fake) {k} {i}" for i in (1, 2, 3) for k in ("title", "action")},
+        }
+        # 프롬프트 스키마에 포함된 섹션만 응답 (라우팅 정책 반영)
+        report = {name: value for name, value in report.items() if f'"{name}"' in prompt}
+        return FakeResponse(json.dumps(report, ensure_ascii=False), prompt)
+
+
+# ---------------------------------------
+# 3. 진행 통계
+# ---------------------------------------
+class BatchStats:
+    """처리량/오류율 실시간 집계 (스레드 안전)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.counts = {"ok": 0, "fallback": 0, "error": 0, "skipped": 0, "invalid": 0}
+
+    def add(self, status):
+        with self.lock:
+            self.counts[status] += 1
+
+    def line(self, in_flight=0):
+        with self.lock:
+            counts = dict(self.counts)
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        processed = counts["ok"] + counts["fallback"] + counts["error"]
+        failed = counts["fallback"] + counts["error"]
+        error_rate = (failed / processed * 100) if processed else 0.0
+        return (f"[batch] processed={processed} ok={counts['ok']} fallback={counts['fallback']} "
+                f"error={counts['error']} skipped={counts['skipped']} invalid={counts['invalid']} "
+                f"in_flight={in_flight} rate={processed / elapsed:.2f}/s error_rate={error_rate:.1f}% "
+                f"elapsed={elapsed:.0f}s")
+
+
+# ---------------------------------------
+# 4. 체크포인트 및 입출력
+# ---------------------------------------
+def load_checkpoint(output_path):
+    """기존 출력 파일에서 성공(status=ok) 처리된 vault hash 목록을 읽습니다."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 중단 시 마지막 줄이 잘렸을 수 있음
+            if record.get("status") == "ok":
+                done.add(record.get("vault_hash"))
+    return done
+
+
+def iter_answers(input_path):
+    """입력 JSONL을 한 줄씩 읽습니다. (파일 전체를 메모리에 올리지 않음)"""
+    with open(input_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                answers = json.loads(line)
+            except ValueError:
+                answers = None
+            yield line_no, answers
+
+
+def analyze_line(line_no, answers, model, agencies):
+    """설문 1건을 파이프라인에 통과시키고 출력 레코드를 반환합니다."""
+    try:
+        report = engine.run_full_analysis(answers, model=model, agencies=agencies)
+        status = "fallback" if report["analysis"].get("fallback") else "ok"
+        return dict(report, line=line_no, status=status, error=None)
+    except Exception as e:
+        vault_hash = engine.process_and_vault_questionnaire(answers)["hash"]
+        return {"line": line_no, "vault_hash": vault_hash, "status": "error", "error": str(e)}
+
+
+def load_agency_source(source):
+    """파트너사 목록을 URL 또는 로컬 JSON 파일에서 읽습니다."""
+    if source.startswith("http://") or source.startswith("https://"):
+        return engine.load_agencies(source)
+    with open(source, encoding="utf-8") as f:
+        return engine.validate_agencies(json.load(f))
+
+
+# ---------------------------------------
+# 5. 실행
+# ---------------------------------------
+def run_batch(input_path, output_path, model, agencies, workers=DEFAULT_WORKERS, stats_interval=STATS_INTERVAL):
+    """입력 JSONL을 제한된 워커 풀로 처리하며 결과를 즉시 출력 JSONL에 추가합니다."""
+    done = load_checkpoint(output_path)
+    stats = BatchStats()
+    max_in_flight = workers * 2
+    pending = set()
+    last_report = time.monotonic()
+
+    def report(force=False):
+        nonlocal last_report
+        if force or time.monotonic() - last_report >= stats_interval:
+            print(stats.line(len(pending)), file=sys.stderr, flush=True)
+            last_report = time.monotonic()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def drain(return_when):
+            completed, _ = wait(pending, timeout=stats_interval, return_when=return_when)
+            for future in completed:
+                pending.discard(future)
+                record = future.result()
+                stats.add(record["status"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            report()
+
+        for line_no, answers in iter_answers(input_path):
+            if not isinstance(answers, dict):
+                print(f"[batch] line {line_no}: invalid JSON object, skipped", file=sys.stderr)
+                stats.add("invalid")
+                continue
+            if engine.process_and_vault_questionnaire(answers)["hash"] in done:
+                stats.add("skipped")
+                continue
+            # 입력을 미리 모두 제출하지 않도록 진행 중 작업 수를 제한
+            while len(pending) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+            pending.add(executor.submit(analyze_line, line_no, answers, model, agencies))
+
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    report(force=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="설문 JSONL 일괄 분석기")
+    parser.add_argument("input", help="설문 응답 JSONL 파일")
+    parser.add_argument("-o", "--output", help="결과 JSONL 파일 (기본: <input>.reports.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="동시 처리 워커 수")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="초당 최대 LLM 호출 수 (0=무제한)")
+    parser.add_argument("--agencies", default=DEFAULT_AGENCIES, help="파트너사 JSON 파일 경로 또는 URL")
+    parser.add_argument("--fake-model", action="store_true", help="Gemini 대신 오프라인 가짜 모델 사용")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="가짜 모델 평균 지연(초)")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="가짜 모델 오류율 (0~1)")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL, help="진행 통계 출력 간격(초)")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or os.path.splitext(args.input)[0] + ".reports.jsonl"
+
+    # 라우팅으로 선택되는 모든 모델 등급이 같은 속도 제한을 공유하도록 생성 함수를 감쌈
+    limiter = RateLimiter(args.rate, burst=args.workers)
+    if args.fake_model:
+        engine.set_model_factory(lambda name: RateLimitedModel(
+            FakeGeminiModel(latency=args.fake_latency, error_rate=args.fake_error_rate, model_name=name), limiter))
+        model = engine.get_model(engine.MODEL_NAME)
+    else:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            parser.error("GOOGLE_API_KEY 환경 변수가 필요합니다. (오프라인 실행은 --fake-model)")
+        engine.set_model_factory(lambda name: RateLimitedModel(engine.genai.GenerativeModel(name), limiter))
+        model = engine.init_model(api_key)
+
+    agencies = load_agency_source(args.agencies)
+    stats = run_batch(args.input, output_path, model, agencies, workers=args.workers, stats_interval=args.stats_interval)
+    return 1 if stats.counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
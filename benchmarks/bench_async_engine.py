@@ -0,0 +1,186 @@
+# bench_async_engine.py - 외부 호출 처리 방식별 스레드 수/처리량 비교 (동시 세션 200개 시뮬레이션)
+#
+# 사용법: python benchmarks/bench_async_engine.py [--sessions 200] [--latency 1.0] [--lead-rate 0.1]
+#
+# 세션마다 Streamlit 스크립트 스레드처럼 스레드 1개가 설문 제출 → AI 분석 → 추천 이유 → (일부) 상담 신청
+# 흐름을 실행합니다. 가짜 모델(batch_runner.FakeGeminiModel)은 --latency 초 전후로 대기하고,
+# Sheets 저장은 블로킹 sleep으로 흉내 냅니다. 케이스별로 새 프로세스를 띄워 최대 스레드 수와
+# 최대 RSS(/proc/self/status의 VmHWM)를 측정합니다. (Linux 전용)
+#
+#   threads-8   : 이전 구조. 분석은 8개 스레드 풀, 추천 이유/Sheets는 스크립트 스레드에서 동기 호출
+#   threads-N   : 이전 구조에서 풀 크기를 세션 수만큼 늘린 경우 (호출당 스레드 1개)
+#   async       : async_io.AsyncEngine (이벤트 루프 스레드 1개 + 블로킹 호출용 스레드 최대 4개, 필요할 때 생성)
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCORED_KEYS = [
+    'behavior_q1_schedule', 'behavior_q2_weekend', 'behavior_q3_appearance', 'other_q16_specific_day',
+    'comm_q4_phone_habit', 'phone_q7_voicemail', 'phone_q8_call_rejection', 'phone_q9_silent_call', 'comm_q10_katalk',
+    'comm_q5_attitude', 'comm_q6_intimacy', 'routine_q11_bathroom', 'routine_q12_sleep_phone',
+    'vehicle_q13_cleanliness', 'vehicle_q14_bluetooth', 'finance_q15_spending',
+]
+
+
+def _vm_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class ThreadSampler:
+    """실행 중 최대 스레드 수(전체 / 세션 스레드를 제외한 I/O 처리용)를 주기적으로 기록합니다."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = {t.ident for t in threading.enumerate()}
+        self.peak = threading.active_count()
+        self.peak_io = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            threads = threading.enumerate()
+            self.peak = max(self.peak, len(threads))
+            io_threads = [t for t in threads if t.ident not in self.baseline and not t.name.startswith("script-")]
+            self.peak_io = max(self.peak_io, len(io_threads) - 1)  # 샘플러 자신 제외
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_sessions(count, seed):
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        yes_ratio = rng.random()
+        answers = {"dossier_job": "회사원", "dossier_personality": "내성적", "comm_q15_intimacy_style": "변화 없음"}
+        for key in SCORED_KEYS:
+            answers[key] = "예" if rng.random() < yes_ratio else "아니오"
+        sessions.append(answers)
+    return sessions
+
+
+def run_case(mode, sessions, latency, lead_rate, sheets_latency, pool_size):
+    """한 프로세스에서 케이스 하나를 실행하고 측정값 dict를 반환합니다."""
+    import engine
+    import batch_runner
+    from async_io import AsyncEngine
+
+    engine.set_model_factory(lambda name: batch_runner.FakeGeminiModel(latency=latency, model_name=name))
+    model = engine.get_model(engine.MODEL_NAME)
+    agencies = batch_runner.load_agency_source(os.path.join(ROOT, "agencies.json"))
+    rng = random.Random(1)
+    leads = [rng.random() < lead_rate for _ in sessions]
+
+    def save_lead(_lead):
+        time.sleep(sheets_latency)
+        return True
+
+    lead_futures = []
+    lead_lock = threading.Lock()
+    baseline_rss = _vm_status("VmRSS:")
+    latencies = [0.0] * len(sessions)
+    start_gate = threading.Event()
+
+    def session(index, answers):
+        start_gate.wait()
+        started = time.perf_counter()
+        score = engine.calculate_base_score(answers)
+        dossier = engine.build_dossier_info(answers)
+        partners = engine.get_weighted_unique_recommendations(agencies, k=3) if score >= 40 else []
+        if mode == "async":
+            result = io_engine.submit(engine.perform_ai_analysis_async, engine.SERVICE_TYPE, dossier, answers, score, model=model).result()
+            if partners:
+                io_engine.run(engine.generate_recommendation_reasons_async(partners, result, score, model=model))
+            if leads[index]:
+                with lead_lock:
+                    lead_futures.append(io_engine.offload(save_lead, answers))
+        else:
+            result = pool.submit(engine.perform_ai_analysis, engine.SERVICE_TYPE, dossier, answers, score, model=model).result()
+            if partners:
+                engine.generate_recommendation_reasons(partners, result, score, model=model)
+            if leads[index]:
+                save_lead(answers)
+        latencies[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=session, args=(i, a), name=f"script-{i}") for i, a in enumerate(sessions)]
+    for t in threads:
+        t.start()
+    with ThreadSampler() as sampler:
+        io_engine = AsyncEngine() if mode == "async" else None
+        pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="analysis") if mode != "async" else None
+        wall_start = time.perf_counter()
+        start_gate.set()
+        for t in threads:
+            t.join()
+        for f in lead_futures:
+            f.result()  # 백그라운드 Sheets 저장까지 끝난 시점을 처리 완료로 계산
+        wall = time.perf_counter() - wall_start
+
+    return {
+        "mode": mode,
+        "io_threads": sampler.peak_io,
+        "peak_threads": sampler.peak,
+        "wall": wall,
+        "throughput": len(sessions) / wall,
+        "p50": statistics.median(latencies),
+        "p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+        "rss_delta_mb": (_vm_status("VmHWM:") - baseline_rss) / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="외부 호출 처리 방식별 스레드 수/처리량 비교")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="가짜 모델 평균 지연(초)")
+    parser.add_argument("--lead-rate", type=float, default=0.1, help="상담 신청(Sheets 저장) 비율")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="Sheets 저장 지연(초)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.sessions, args.seed)
+    if args.case:
+        mode, pool_size = args.case.split(":")
+        result = run_case(mode, sessions, args.latency, args.lead_rate, args.sheets_latency, int(pool_size))
+        print(json.dumps(result))
+        return
+
+    cases = [("threads-8", "threads:8"), (f"threads-{args.sessions}", f"threads:{args.sessions}"), ("async", "async:0")]
+    print(f"sessions={args.sessions} model latency~{args.latency}s lead rate={args.lead_rate} sheets latency={args.sheets_latency}s")
+    header = f"{'case':<14}{'I/O threads':>12}{'peak threads':>14}{'wall s':>9}{'sessions/s':>12}{'p50 s':>8}{'p95 s':>8}{'peak RSS +MB':>14}"
+    print(header)
+    print("-" * len(header))
+    for label, case in cases:
+        cmd = [sys.executable, os.path.abspath(__file__), "--case", case] + [
+            f"--sessions={args.sessions}", f"--latency={args.latency}", f"--lead-rate={args.lead_rate}",
+            f"--sheets-latency={args.sheets_latency}", f"--seed={args.seed}",
+        ]
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<14}{r['io_threads']:>12}{r['peak_threads']:>14}{r['wall']:>9.2f}{r['throughput']:>12.1f}"
+              f"{r['p50']:>8.2f}{r['p95']:>8.2f}{r['rss_delta_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
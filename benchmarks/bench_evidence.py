@@ -0,0 +1,138 @@
+# bench_evidence.py - 증거 이미지 파이프라인의 메모리/전송량 벤치마크
+#
+# 사용법: python benchmarks/bench_evidence.py [--megapixels 24] [--files 4] [--capture-height 9000]
+#
+# 입력: 휴대폰 원본 JPEG(EXIF 포함)와 세로로 긴 카카오톡 캡처 PNG (draft가 적용되지 않는 형식)
+#
+# 케이스별로 새 프로세스를 띄워 최대 RSS 증가량(/proc/self/status의 VmHWM)을 측정합니다.
+# (Pillow의 픽셀 버퍼는 tracemalloc에 잡히지 않으므로 RSS 기준으로 측정, Linux 전용)
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_phone_photo(path, megapixels):
+    """EXIF가 포함된 대용량 JPEG(휴대폰 원본 사진 수준)을 생성합니다."""
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # 노이즈 + 그라데이션: 압축이 잘 안 되는 실제 사진에 가까운 크기
+    noise = Image.effect_noise((width, height), 64).convert("L")
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation
+    exif[0x010F] = "BenchPhone"
+    img.save(path, format="JPEG", quality=95, exif=exif)
+    return os.path.getsize(path)
+
+
+def make_chat_capture(path, height):
+    """세로로 긴 메신저 캡처 PNG(폭 1080px)를 생성합니다."""
+    from PIL import Image, ImageDraw
+
+    width = 1080
+    img = Image.new("RGB", (width, height), (178, 199, 217))
+    draw = ImageDraw.Draw(img)
+    # 말풍선 + 약한 노이즈: PNG 압축률을 실제 캡처와 비슷하게 유지
+    for top in range(0, height, 160):
+        left = 40 if (top // 160) % 2 else width - 640
+        draw.rounded_rectangle((left, top + 20, left + 600, top + 130), radius=24, fill=(255, 235, 51) if left > 40 else (255, 255, 255))
+    noise = Image.effect_noise((width, height), 8).convert("RGB")
+    Image.blend(img, noise, 0.05).save(path, format="PNG")
+    return os.path.getsize(path)
+
+
+def _maxrss_bytes():
+    # ru_maxrss는 fork 시 부모 값을 물려받으므로, exec 이후 초기화되는 VmHWM을 사용
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def run_case(mode, paths):
+    """자식 프로세스에서 한 가지 처리 방식을 실행하고 결과를 출력합니다."""
+    from PIL import Image
+    import evidence
+
+    baseline = _maxrss_bytes()
+    started = time.perf_counter()
+    sent_bytes = 0
+
+    if mode == "naive":
+        # 기존 방식 가정: 원본 전체 디코딩 후 그대로 재인코딩하여 전송
+        for path in paths:
+            with open(path, "rb") as f:
+                raw = f.read()
+            img = Image.open(io.BytesIO(raw))
+            img.load()
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=90, exif=img.info.get("exif", b""))
+            sent_bytes += len(buffer.getvalue())
+    else:
+        files = [open(path, "rb") for path in paths]
+        try:
+            items = evidence.process_evidence_batch(files)
+        finally:
+            for f in files:
+                f.close()
+        sent_bytes = sum(len(item["data"]) for item in items)
+        for item in items:
+            if "exif" in Image.open(io.BytesIO(item["data"])).info:
+                raise SystemExit("EXIF was not stripped")
+
+    elapsed = time.perf_counter() - started
+    peak_delta = _maxrss_bytes() - baseline
+    print(f"{mode},{elapsed:.3f},{peak_delta},{sent_bytes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megapixels", type=float, default=24.0)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--capture-height", type=int, default=9000)
+    parser.add_argument("--case", choices=["naive", "pipeline"])
+    parser.add_argument("paths", nargs="*")
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.paths)
+        return
+
+    import evidence
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo = os.path.join(tmp, "photo.jpg")
+        capture = os.path.join(tmp, "capture.png")
+        inputs = [
+            (photo, make_phone_photo(photo, args.megapixels), f"JPEG ({args.megapixels:.0f} MP, EXIF orientation=6)"),
+            (capture, make_chat_capture(capture, args.capture_height),
+             f"PNG capture (1080x{args.capture_height}, full decodes at once: {evidence.MAX_FULL_DECODES})"),
+        ]
+        for path, size, label in inputs:
+            paths = [path] * args.files
+            print(f"input: {args.files} x {size / 1e6:.1f} MB {label}")
+            print(f"{'mode':<10}{'seconds':>10}{'peak RSS +MB':>16}{'sent KB total':>16}{'sent KB/file':>15}")
+            for mode in ("naive", "pipeline"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--case", mode] + paths,
+                    check=True, capture_output=True, text=True,
+                ).stdout.strip().splitlines()[-1]
+                _, elapsed, peak, sent = out.split(",")
+                print(f"{mode:<10}{float(elapsed):>10.2f}{int(peak) / 1e6:>16.1f}"
+                      f"{int(sent) / 1024:>16.0f}{int(sent) / 1024 / args.files:>15.0f}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# bench_routing.py - 위험 단계별 모델 라우팅 전/후 지연 시간·비용 비교 리포트
+#
+# 사용법: python benchmarks/bench_routing.py [--samples 400] [--seed 7]
+#
+# 오프라인 시뮬레이션입니다. 가짜 모델은 실제로 대기하지 않고, 모델 등급별
+# 첫 토큰 지연 + 출력 토큰 생성 속도로 호출 지연을 계산합니다. 출력 토큰 수는
+# 요청된 스키마 섹션(routing.SECTION_OUTPUT_TOKENS, 응답마다 길이 변동)으로 정해지고,
+# max_output_tokens를 넘으면 실제 JSON 모드처럼 응답이 잘려 파싱 실패(폴백 리포트)가 됩니다.
+# 비용은 routing.MODEL_PRICES_PER_1M을 사용합니다. 수치는 상대 비교용 추정치입니다.
+# (실서비스 값은 ?ops 패널의 단계별 지표 참고)
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+import routing  # noqa: E402
+from batch_runner import FakeGeminiModel, FakeUsage, load_agency_source  # noqa: E402
+
+# 모델 등급별 (첫 토큰 지연 초, 초당 출력 토큰) - 가정치
+TIER_SPEED = {
+    "gemini-2.0-flash": (0.55, 170.0),
+    "gemini-2.0-flash-lite": (0.35, 240.0),
+}
+
+# 응답별 출력 길이 변동 (섹션 예상 토큰 대비 배율) - 가정치
+OUTPUT_LENGTH_RANGE = (0.85, 1.3)
+REASON_TOKENS_PER_PARTNER = 90
+
+SCORED_KEYS = [
+    'behavior_q1_schedule', 'behavior_q2_weekend', 'behavior_q3_appearance', 'other_q16_specific_day',
+    'comm_q4_phone_habit', 'phone_q7_voicemail', 'phone_q8_call_rejection', 'phone_q9_silent_call', 'comm_q10_katalk',
+    'comm_q5_attitude', 'comm_q6_intimacy', 'routine_q11_bathroom', 'routine_q12_sleep_phone',
+    'vehicle_q13_cleanliness', 'vehicle_q14_bluetooth', 'finance_q15_spending',
+]
+
+
+class SimulatedTierModel(FakeGeminiModel):
+    """응답 내용은 FakeGeminiModel을 따르고, 지연/토큰은 등급별 가정치로 계산합니다."""
+
+    calls = []
+    jitter = random.Random(0)  # 호출 지연 변동 (전역 random과 분리하여 정책 간 결과 고정)
+    length_jitter = random.Random(1)  # 응답 길이 변동
+
+    def __init__(self, model_name):
+        super().__init__(latency=0, model_name=model_name)
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None):
+        response = super().generate_content(contents, generation_config, safety_settings)
+        prompt = contents[0] if isinstance(contents, list) else contents
+        partners = prompt.count("- 업체명: ")
+        if partners:
+            wanted = partners * REASON_TOKENS_PER_PARTNER
+        else:
+            wanted = sum(tokens for name, tokens in routing.SECTION_OUTPUT_TOKENS.items() if f'"{name}"' in prompt)
+            wanted = int(wanted * SimulatedTierModel.length_jitter.uniform(*OUTPUT_LENGTH_RANGE))
+        limit = getattr(generation_config, "max_output_tokens", None) or 8192
+        output_tokens = min(wanted, limit)
+        if wanted > limit:
+            # 한도에서 잘린 JSON → json.loads 실패 (실제 모델의 MAX_TOKENS 종료와 동일)
+            response.text = response.text[:len(response.text) * limit // wanted]
+        first_token, tokens_per_sec = TIER_SPEED.get(self.model_name, TIER_SPEED["gemini-2.0-flash"])
+        input_tokens = len(prompt) // 2
+        response.usage_metadata = FakeUsage(input_tokens, output_tokens)
+        SimulatedTierModel.calls.append({
+            "latency": (first_token + output_tokens / tokens_per_sec) * SimulatedTierModel.jitter.uniform(0.8, 1.5),
+            "cost": routing.estimate_cost(self.model_name, input_tokens, output_tokens),
+        })
+        return response
+
+
+def make_answers(rng, yes_ratio):
+    answers = {"dossier_job": "회사원", "dossier_personality": "내성적", "comm_q15_intimacy_style": "변화 없음"}
+    for key in SCORED_KEYS:
+        answers[key] = "예" if rng.random() < yes_ratio else "아니오"
+    return answers
+
+
+def run_policy(policy, samples, agencies):
+    """정책 하나로 샘플 전체를 실행하고 위험 단계별 (지연 목록, 비용 목록, 호출 수, 폴백 수)를 반환합니다."""
+    routing.set_policy(policy)
+    SimulatedTierModel.jitter.seed(0)
+    SimulatedTierModel.length_jitter.seed(1)
+    engine.set_model_factory(SimulatedTierModel)
+    model = engine.get_model(engine.MODEL_NAME)
+    per_band = {}
+    for answers, seed in samples:
+        random.seed(seed)  # 점수 변동/파트너 선택을 정책 간 동일하게 고정
+        SimulatedTierModel.calls = []
+        report = engine.run_full_analysis(answers, model=model, agencies=agencies)
+        band = per_band.setdefault(report["risk_level"], {"latency": [], "cost": [], "calls": 0, "fallback": 0})
+        # 분석 → 추천 이유는 순차 호출이므로 지연은 합산
+        band["latency"].append(sum(c["latency"] for c in SimulatedTierModel.calls))
+        band["cost"].append(sum(c["cost"] for c in SimulatedTierModel.calls))
+        band["calls"] += len(SimulatedTierModel.calls)
+        band["fallback"] += 1 if report["analysis"].get("fallback") else 0
+    return per_band
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모델 라우팅 전/후 비교")
+    parser.add_argument("--samples", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--policy", help="비교할 라우팅 정책 JSON 파일 (기본: routing.DEFAULT_ROUTING_POLICY)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    samples = [(make_answers(rng, rng.random()), rng.random()) for _ in range(args.samples)]
+    agencies = load_agency_source(os.path.join(ROOT, "agencies.json"))
+
+    routed_policy = routing.DEFAULT_ROUTING_POLICY
+    if args.policy:
+        with open(args.policy, encoding="utf-8") as f:
+            routed_policy = routing.configure(json.load(f))
+
+    before = run_policy(routing.LEGACY_ROUTING_POLICY, samples, agencies)
+    after = run_policy(routed_policy, samples, agencies)
+
+    columns = f"{'calls/rpt':>9}{'p50 s':>7}{'p95 s':>7}{'$/1k rpt':>10}{'fallback':>9}"
+    header = f"{'band':<8}{'n':>5} | {columns} | {columns} | {'cost Δ':>8}"
+    print(f"{'':<14}| {'before (legacy: flash, full schema)':<51}| {'after (routed)':<51}|")
+    print(header)
+    print("-" * len(header))
+    totals = {"before": 0.0, "after": 0.0}
+    for band in routing.DEFAULT_ROUTING_POLICY:
+        if band not in before:
+            continue
+        b, a = before[band], after[band]
+        n = len(b["latency"])
+        row = f"{band:<8}{n:>5} | "
+        for stats in (b, a):
+            row += (f"{stats['calls'] / n:>9.2f}{percentile(stats['latency'], 50):>7.2f}{percentile(stats['latency'], 95):>7.2f}"
+                    f"{statistics.mean(stats['cost']) * 1000:>10.4f}{stats['fallback'] / n:>9.1%} | ")
+        change = (sum(a["cost"]) / sum(b["cost"]) - 1) * 100 if sum(b["cost"]) else 0.0
+        row += f"{change:>7.1f}%"
+        print(row)
+        totals["before"] += sum(b["cost"])
+        totals["after"] += sum(a["cost"])
+    print("-" * len(header))
+    print(f"total cost: before ${totals['before']:.4f}  after ${totals['after']:.4f}  "
+          f"({(totals['after'] / totals['before'] - 1) * 100:.1f}%) over {args.samples} reports")
+
+
+if __name__ == "__main__":
+    main()
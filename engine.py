@@ -0,0 +1,517 @@
+# engine.py (Reset Security - 분석 파이프라인 코어)
+# Streamlit UI(app.py)와 배치 실행기(batch_runner.py)가 함께 사용하며, Streamlit에 의존하지 않습니다.
+import google.generativeai as genai
+import json
+import random
+import hashlib
+from datetime import datetime
+import time
+import requests
+from urllib.parse import quote
+
+import metrics
+import routing
+
+# ---------------------------------------
+# 0. 모델 설정
+# ---------------------------------------
+MODEL_NAME = 'gemini-2.0-flash'
+SERVICE_TYPE = "💔 관계 신뢰도 분석 (배우자/연인)" # 용어 변경
+
+
+# 모델 이름 → 인스턴스 생성 함수 (배치 실행기는 가짜 모델/속도 제한 래퍼로 교체)
+_model_factory = genai.GenerativeModel
+_model_cache = {}
+
+
+def set_model_factory(factory):
+    """모델 생성 함수를 교체합니다. (이미 생성된 모델 캐시는 비움)"""
+    global _model_factory
+    _model_factory = factory
+    _model_cache.clear()
+
+
+def get_model(model_name):
+    """모델 등급(이름)별 인스턴스를 재사용합니다."""
+    if model_name not in _model_cache:
+        _model_cache[model_name] = _model_factory(model_name)
+    return _model_cache[model_name]
+
+
+def init_model(api_key):
+    """Gemini 모델을 초기화합니다."""
+    genai.configure(api_key=api_key)
+    return get_model(MODEL_NAME)
+
+
+def resolve_model(model, model_name):
+    """라우팅된 모델 등급의 인스턴스를 반환합니다. (model이 None이면 AI 비활성)"""
+    if not model or not model_name:
+        return model
+    if str(getattr(model, "model_name", "")).split("/")[-1] == model_name:
+        return model
+    return get_model(model_name)
+
+
+def record_llm_call(kind, band, model_name, started, response=None):
+    """LLM 호출 1회의 지연 시간과 추정 비용을 위험 단계별로 기록합니다."""
+    elapsed = time.perf_counter() - started
+    metrics.observe(f"{kind}.latency_sec.{band}", elapsed)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        cost = routing.estimate_cost(model_name, getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0)
+        metrics.observe(f"{kind}.cost_usd.{band}", cost)
+
+
+# ---------------------------------------
+# 1. 파트너사 데이터
+# ---------------------------------------
+def load_agencies(url, session=None, timeout=10):
+    """깃허브에서 파트너사 JSON 데이터를 가져옵니다. (캐시는 호출 측에서 처리, session: 연결 재사용용)"""
+    if url.endswith("YOUR_ID/YOUR_REPO/main/agencies.json"):
+        return []
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        if response.status_code == 200:
+            return validate_agencies(json.loads(response.text))
+        return []
+    except Exception as e:
+        print(f"Error fetching agencies: {e}")
+        return []
+
+def load_submission(api_url, token, session=None, timeout=5):
+    """정적 설문 페이지의 제출 결과를 api.py(GET /api/report/<token>)에서 가져옵니다.
+
+    없으면(404) None, 일시적 조회 실패(타임아웃/5xx 등)면 {"status": "unavailable"} (호출 측이 재조회 판단)
+    """
+    try:
+        response = (session or requests).get(f"{api_url.rstrip('/')}/api/report/{quote(str(token), safe='')}", timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 404:
+            return None
+        print(f"Error fetching submission: HTTP {response.status_code}")
+    except Exception as e:
+        print(f"Error fetching submission: {e}")
+    return {"status": "unavailable"}
+
+def validate_agencies(data):
+    """파트너사 목록의 필수 필드를 검증하고 기본값을 채웁니다."""
+    validated_data = []
+    for item in data:
+        if isinstance(item, dict) and 'name' in item:
+            if not isinstance(item.get('weight'), (int, float)) or item.get('weight', 0) <= 0:
+                item['weight'] = 1
+            # 필드가 없으면 빈 문자열로 설정 (★KeyError 방지★)
+            item['url'] = item.get('url', '')
+            item['phone'] = item.get('phone', '문의 필요')
+            item['desc'] = item.get('desc', '검증된 전문 업체')
+            validated_data.append(item)
+    return validated_data
+
+def get_weighted_unique_recommendations(agencies, k=3):
+    # (가중치 기반 선택 로직은 이전 버전과 동일)
+    if not agencies or k <= 0:
+        return []
+
+    if len(agencies) <= k:
+        shuffled = list(agencies)
+        random.shuffle(shuffled)
+        return shuffled
+
+    selected = []
+    pool = list(agencies)
+    
+    for _ in range(k):
+        if not pool:
+            break
+        weights = [agency.get('weight', 1) for agency in pool]
+        try:
+            choice = random.choices(pool, weights=weights, k=1)[0]
+            selected.append(choice)
+            pool.remove(choice)
+        except Exception as e:
+            print(f"Weighted selection error: {e}. Falling back.")
+            if pool:
+                choice = random.choice(pool)
+                selected.append(choice)
+                pool.remove(choice)
+
+    return selected
+
+# ---------------------------------------
+# 2. 설문 점수 계산 시스템 (★v5.3 강화 - 동적 점수 생성★)
+# ---------------------------------------
+def calculate_base_score(answers):
+    """확장된 설문 응답을 기반으로 동적 점수를 계산합니다."""
+    score = 0
+    
+    # 점수 매핑 정의 (아니오=0, 가끔/의심=3, 예/확실함=7)
+    # 다양한 응답 옵션을 포괄하도록 매핑 확장
+    score_map = {
+        "아니오": 0, "변화 없음": 0, "확인 안 함": 0,
+        "가끔 그렇다": 3, "약간 의심됨": 3, "시간 감소": 3,
+        "예": 7, "확실함": 7, "요구사항 변화": 7
+    }
+    
+    # 각 질문에 대한 점수 합산 (v5.3 확장된 설문 반영)
+    question_keys = [
+        # Step 2: 일상 및 행동 변화
+        'behavior_q1_schedule', 'behavior_q2_weekend', 'behavior_q3_appearance', 'other_q16_specific_day',
+        # Step 3: 휴대폰 사용 및 소통 변화
+        'comm_q4_phone_habit', 'phone_q7_voicemail', 'phone_q8_call_rejection', 'phone_q9_silent_call', 'comm_q10_katalk',
+        # Step 4: 관계 및 태도 변화
+        'comm_q5_attitude', 'comm_q6_intimacy', 'comm_q15_intimacy_style', 'routine_q11_bathroom', 'routine_q12_sleep_phone',
+        # Step 5: 차량 및 기타 정황
+        'vehicle_q13_cleanliness', 'vehicle_q14_bluetooth', 'finance_q15_spending'
+        # (evidence_q18_physical_evidence는 점수 계산에서는 제외하고 증거 수준 평가에 활용)
+    ]
+    
+    for key in question_keys:
+        response = answers.get(key, '')
+        score += score_map.get(response, 0)
+
+    # 최대 점수(7점 * 17문항 = 119점)를 95점 만점으로 스케일링
+    max_raw_score = 7 * len(question_keys)
+    if max_raw_score > 0:
+        scaled_score = (score / max_raw_score) * 95
+    else:
+        scaled_score = 0
+
+    # 랜덤 변동 추가 (±3%) 및 최종 보정
+    variation = random.uniform(-3, 3)
+    final_score = int(round(scaled_score + variation))
+    final_score = min(max(final_score, 5), 98) # 5~98점 사이 보장
+    
+    return final_score
+
+def get_risk_level_korean(score):
+    """점수에 따른 한글 위험도 레벨 반환 (포지셔닝 변경 반영)"""
+    if score >= 80:
+        return "심각 단계", "risk-critical"
+    elif score >= 60:
+        return "위험 단계", "risk-serious"
+    elif score >= 40:
+        return "주의 단계", "risk-caution"
+    else:
+        return "안정 단계", "risk-normal"
+
+
+# ---------------------------------------
+# 3. AI 분석 엔진 (강화된 프롬프트)
+# ---------------------------------------
+
+# 출력 스키마 (섹션 단위로 분리하여 라우팅 정책에 따라 조합)
+SCHEMA_SECTIONS = {
+    "risk_assessment": """      "risk_assessment": {
+        "summary": "(string: 4-6문장의 상세하고 전문적인 상담 분석. 의뢰인의 심리 상태에 공감하며, 객관적인 행동 패턴 분석 결과를 설명하고 그 의미를 해석.)"
+      }""",
+    "deep_analysis": """      "deep_analysis": {
+        "pattern1_title": "(string: 핵심 분석 영역 1 제목)",
+        "pattern1_analysis": "(string: 2-3문장의 상세 분석)",
+        "pattern2_title": "(string: 핵심 분석 영역 2 제목)",
+        "pattern2_analysis": "(string: 2-3문장의 상세 분석)",
+        "pattern3_title": "(string: 핵심 분석 영역 3 제목)",
+        "pattern3_analysis": "(string: 2-3문장의 상세 분석)"
+      }""",
+    "litigation_readiness": """      "litigation_readiness": {
+        "suspicion_score": (int: 심증 점수, 입력된 calculated_score와 유사하게),
+        "evidence_score": (int: {evidence_range}),
+        "warning": "(string: 현재 상황의 심각성과 물리적 증거 확보의 필요성을 전문적으로 경고)",
+        "needed_evidence": ["(string: 필요한 증거 항목 3-5개)"]
+      }""",
+    "golden_time": """      "golden_time": {
+        "urgency_message": "(string: 시간의 중요성을 강조하는 전문적 메시지)"
+      }""",
+    "the_dossier": """      "the_dossier": {
+        "profile": "(string: 상대방 프로파일링 2-3문장)",
+        "negotiation_strategy": "(string: 전략 제안 2-3문장)"
+      }""",
+    "the_war_room": """      "the_war_room": {
+        "step1_title": "(string: 1단계 제목)",
+        "step1_action": "(string: 구체적 행동 지침)",
+        "step2_title": "(string: 2단계 제목)",
+        "step2_action": "(string: 구체적 행동 지침)",
+        "step3_title": "(string: 3단계 제목)",
+        "step3_action": "(string: 구체적 행동 지침)"
+      }""",
+}
+
+def get_analysis_prompt(service_type, dossier_info, questionnaire_data, calculated_score, evidence_count=0, sections=None):
+    """설문 기반 AI 분석 프롬프트 (★v5.3 수정 - 상세 코멘트 및 포지셔닝 강화★)"""
+    
+    # 라우팅 정책에 따라 필요한 섹션만 스키마에 포함
+    sections = sections or routing.ALL_SECTIONS
+    omega_schema = "\n    {\n" + ",\n".join(SCHEMA_SECTIONS[name] for name in sections) + "\n    }\n    "
+
+    q_data_text = "\n".join([f"- {q}: {a}" for q, a in questionnaire_data.items()])
+
+    # 증거 이미지가 첨부된 경우에만 이미지 관련 지침 추가
+    # (evidence_score 상한도 첨부 여부에 따라 달라지므로 지침 4와 스키마 설명을 함께 바꿈)
+    if evidence_count:
+        evidence_rule = "4. evidence_score는 첨부 이미지에서 확인되는 정황만 반영하여 0-40점 사이로 설정하세요. 설문 응답만으로는 점수를 올리지 마세요."
+        evidence_range = "0-40 사이. 첨부 이미지에서 확인되는 정황만 반영"
+        evidence_guide = f"6. 의뢰인이 증거 이미지 {evidence_count}장을 함께 첨부했습니다. 이미지에서 확인되는 정황을 분석에 반영하세요."
+        evidence_text = f"- 첨부 증거 이미지: {evidence_count}장 (본 프롬프트와 함께 전달됨)"
+    else:
+        evidence_rule = "4. evidence_score는 설문 기반이므로 반드시 0-15점 사이로 극도로 낮게 설정하세요."
+        evidence_range = "0-15 사이. 설문은 물증이 아니므로 극도로 낮게"
+        evidence_guide = ""
+        evidence_text = "- 첨부 증거 이미지: 없음"
+    omega_schema = omega_schema.replace("{evidence_range}", evidence_range)
+
+    # [★v5.3 수정★] 역할 변경: 심리 상담 및 행동 분석 전문가
+    return f"""
+    [시스템 역할]: 당신은 20년 경력의 관계 심리 상담사이자 행동 패턴 분석 전문가입니다.
+    [목표]: 의뢰인의 설문 데이터를 분석하여 전문적이고 깊이 있는 관계 신뢰도 분석 리포트를 작성합니다.
+    
+    [분석 지침]:
+    1. 설문 응답 간의 상관관계를 심층 분석하세요.
+    2. 'risk_assessment.summary'는 반드시 4-6문장으로 상세하게 작성하세요. 의뢰인이 느끼는 불안감에 깊이 공감하면서도, 관찰된 행동 패턴이 심리학적으로 어떤 의미를 가지는지 전문적으로 설명하세요.
+    3. 이미 계산된 위험 신호 점수는 {calculated_score}점입니다. suspicion_score는 이 값과 유사하게 설정하세요.
+    {evidence_rule}
+    5. 모든 분석은 상담 전문가의 신뢰감 있고 지지적인 톤으로 작성하세요.
+    {evidence_guide}
+    
+    [입력 데이터]
+    - 상대방 정보: {dossier_info}
+    - 설문 응답:
+    {q_data_text}
+    - 사전 계산된 위험 신호 점수: {calculated_score}점
+    {evidence_text}
+
+    [출력 형식]: 반드시 아래 JSON 스키마만 출력. 다른 텍스트 금지.
+    {omega_schema}
+    """
+
+def select_route(calculated_score):
+    """점수의 위험 단계에 맞는 라우팅 설정 (모델 등급/출력 한도/섹션)"""
+    band, _ = get_risk_level_korean(calculated_score)
+    return routing.select_route(band)
+
+def prepare_ai_analysis(service_type, dossier_info, questionnaire_data, calculated_score, evidence_parts=None, model=None):
+    """AI 분석 요청을 구성합니다. LLM 호출이 필요 없으면 (None, 최종 결과), 필요하면 (요청, None)."""
+    if not model:
+        # AI 엔진 미작동 시 폴백 처리 (점수 기반 기본 분석 결과 반환)
+        return None, {"fallback": True, "calculated_score": calculated_score}
+
+    route = select_route(calculated_score)
+    route_info = {"band": route["band"], "model": route["model"] or "local", "sections": route["sections"]}
+    if not route["model"]:
+        # 정책상 LLM 없이 로컬 리포트로 충분한 단계
+        metrics.incr(f"analysis.local.{route['band']}")
+        return None, dict(build_local_report(calculated_score), route=route_info)
+
+    evidence_parts = evidence_parts or []
+    prompt = get_analysis_prompt(service_type, dossier_info, questionnaire_data, calculated_score, len(evidence_parts), route["sections"])
+    # Temperature 0.4로 설정하여 분석의 깊이와 일관성 유지
+    request = {
+        "model": resolve_model(model, route["model"]),
+        "contents": [prompt] + evidence_parts if evidence_parts else prompt,
+        "kwargs": {
+            "generation_config": genai.GenerationConfig(temperature=0.4, response_mime_type="application/json", max_output_tokens=route.get("max_output_tokens")),
+            "safety_settings": [{"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}],
+        },
+        "route": route,
+        "route_info": route_info,
+    }
+    return request, None
+
+def parse_ai_analysis(request, response, started):
+    """LLM 응답을 리포트 dict로 변환하고 지연/비용을 기록합니다."""
+    record_llm_call("analysis", request["route"]["band"], request["route"]["model"], started, response)
+    result = json.loads(response.text)
+    result["route"] = request["route_info"]
+    return result
+
+def perform_ai_analysis(service_type, dossier_info, questionnaire_data, calculated_score, evidence_parts=None, model=None):
+    """AI 분석 실행 (evidence_parts: 축소/재인코딩된 증거 이미지, 멀티모달 입력으로 전달)"""
+    request, result = prepare_ai_analysis(service_type, dossier_info, questionnaire_data, calculated_score, evidence_parts, model)
+    if request is None:
+        return result
+    try:
+        started = time.perf_counter()
+        response = request["model"].generate_content(request["contents"], **request["kwargs"])
+        return parse_ai_analysis(request, response, started)
+    except Exception as e:
+        print(f"AI Analysis Error: {e}")
+        # AI 분석 실패 시 폴백 처리
+        return {"fallback": True, "calculated_score": calculated_score}
+
+async def perform_ai_analysis_async(service_type, dossier_info, questionnaire_data, calculated_score, evidence_parts=None, model=None):
+    """perform_ai_analysis의 비동기 버전 (async_io 엔진의 이벤트 루프에서 실행, 스레드를 점유하지 않음)"""
+    request, result = prepare_ai_analysis(service_type, dossier_info, questionnaire_data, calculated_score, evidence_parts, model)
+    if request is None:
+        return result
+    try:
+        started = time.perf_counter()
+        response = await request["model"].generate_content_async(request["contents"], **request["kwargs"])
+        return parse_ai_analysis(request, response, started)
+    except Exception as e:
+        print(f"AI Analysis Error: {e}")
+        return {"fallback": True, "calculated_score": calculated_score}
+
+
+def build_local_report(calculated_score):
+    """LLM 없이 점수만으로 만드는 간단 리포트 (라우팅 정책상 로컬 처리 단계용)"""
+    report = build_fallback_report(calculated_score)
+    report['risk_assessment'] = {'summary': '현재 응답에서는 뚜렷한 위험 신호가 크지 않습니다. 다만 불안감이 계속된다면 변화가 관찰된 시점과 상황을 기록해 두시고, 필요 시 전문가와 상담해 보시기 바랍니다.'}
+    report['litigation_readiness']['warning'] = '현재 단계에서는 섣부른 대응보다 객관적인 관찰과 기록이 우선입니다.'
+    return report
+
+def build_limited_report(calculated_score):
+    """LLM을 호출하지 않고 제공하는 점수 기반 리포트 (방문자 할당량 초과/자동화 의심 시)"""
+    route = select_route(calculated_score)
+    report = build_local_report(calculated_score) if route["band"] == "안정 단계" else build_fallback_report(calculated_score)
+    return dict(report, route={"band": route["band"], "model": "local", "sections": route["sections"]}, limited=True)
+
+def build_fallback_report(calculated_score):
+    """AI 분석 결과가 없을 때 사용할 점수 기반 기본 리포트를 생성합니다."""
+    return {
+        'risk_assessment': {'summary': '설문 기반 분석 결과, 위험 신호가 감지되었습니다. 정확한 판단을 위해 전문가의 도움이 필요합니다.'},
+        'deep_analysis': {},
+        'the_dossier': {},
+        'litigation_readiness': {'suspicion_score': calculated_score, 'evidence_score': random.randint(5, 15), 'warning': '물리적 증거 확보가 시급합니다.', 'needed_evidence': ['전문가 상담 필요']},
+        'the_war_room': {},
+        'golden_time': {'urgency_message': '시간이 지날수록 대응이 어려워질 수 있습니다.'}
+    }
+
+
+# ---------------------------------------
+# 4. AI 추천 이유 생성기
+# ---------------------------------------
+def prepare_recommendation_reasons(agencies, analysis_result, calculated_score, model=None):
+    """추천 이유 생성 요청을 구성합니다. 생성하지 않는 경우 None."""
+    if not model or not agencies:
+        return None
+
+    # 라우팅 정책상 추천 이유를 생성하지 않는 단계면 기본 문구 사용
+    route = select_route(calculated_score)
+    if not route.get("partner_reasons") or not route.get("reasons_model"):
+        metrics.incr(f"reasons.skipped.{route['band']}")
+        return None
+
+    agency_list_text = ""
+    expected_json_structure = "{\n"
+    for agency in agencies:
+        agency_list_text += f"- 업체명: {agency['name']}\n  강점: {agency.get('desc', '전문 업체')}\n"
+        safe_key = agency["name"].replace('"', '\\"')
+        expected_json_structure += f'  "{safe_key}": "(string: 추천 이유 1-2문장)",\n'
+    expected_json_structure = expected_json_structure.rstrip(',\n') + "\n}"
+
+    # 폴백 상황 대비 데이터 추출
+    if analysis_result.get('fallback'):
+        risk_summary = "AI 분석 결과 기반 전문가 매칭 필요."
+        needed_evidence = "물리적 증거 확보 시급."
+        dossier_profile = "대상자 정보 기반 분석 필요."
+    else:
+        risk_summary = analysis_result.get('risk_assessment', {}).get('summary', '상황 분석 필요')
+        needed_evidence = ", ".join(analysis_result.get('litigation_readiness', {}).get('needed_evidence', ['증거 확보 필요']))
+        dossier_profile = analysis_result.get('the_dossier', {}).get('profile', 'N/A')
+
+    prompt = f"""
+    [시스템 역할]: 당신은 리셋시큐리티의 수석 전략 컨설턴트입니다. 목표는 의뢰인이 추천된 전문가에게 즉시 연락하도록 설득하는 것입니다.
+    [과제]: AI 분석 결과를 바탕으로, 추천된 업체들이 왜 이 의뢰인에게 '유일한 해결책'인지 설명하는 '추천 이유'를 생성하십시오.
+
+    [의뢰인 상황 분석 (약점)]
+    - 위험 신호 점수: {calculated_score}점
+    - 상황 요약: {risk_summary}
+    - 부족한 증거 (시급): {needed_evidence}
+    - 대상자 프로파일: {dossier_profile}
+
+    [추천 대상 업체 목록 (강점)]
+    {agency_list_text}
+
+    [작성 지침 - 설득의 기술]:
+    1. 각 업체별로 추천 이유를 1~2문장으로 작성합니다.
+    2. ★매우 중요★ 업체의 '강점'을 의뢰인의 '약점(부족한 증거, 대상자 성향)'과 직접 연결하여 설득력을 극대화합니다.
+    3. 창의적이고 전문적인 어조를 사용합니다. (환각 허용)
+
+    [출력 형식]: 반드시 아래 JSON 스키마를 준수하여 출력. Key는 업체명, Value는 추천 이유입니다.
+    {expected_json_structure}
+    """
+    # 창의성을 위해 Temperature 0.8 사용
+    return {
+        "model": resolve_model(model, route["reasons_model"]),
+        "contents": prompt,
+        "kwargs": {"generation_config": genai.GenerationConfig(temperature=0.8, response_mime_type="application/json", max_output_tokens=route.get("reasons_max_output_tokens"))},
+        "route": route,
+    }
+
+def parse_recommendation_reasons(request, response, started):
+    """LLM 응답을 {업체명: 추천 이유} dict로 변환하고 지연/비용을 기록합니다."""
+    record_llm_call("reasons", request["route"]["band"], request["route"]["reasons_model"], started, response)
+    reasons = json.loads(response.text)
+    return reasons if isinstance(reasons, dict) else {}
+
+def generate_recommendation_reasons(agencies, analysis_result, calculated_score, model=None):
+    # (추천 이유 생성 로직은 이전 버전과 동일하게 유지)
+    request = prepare_recommendation_reasons(agencies, analysis_result, calculated_score, model)
+    if request is None:
+        return {}
+    try:
+        started = time.perf_counter()
+        response = request["model"].generate_content(request["contents"], **request["kwargs"])
+        return parse_recommendation_reasons(request, response, started)
+    except Exception as e:
+        print(f"추천 이유 생성 실패: {e}")
+        return {}
+
+async def generate_recommendation_reasons_async(agencies, analysis_result, calculated_score, model=None):
+    """generate_recommendation_reasons의 비동기 버전"""
+    request = prepare_recommendation_reasons(agencies, analysis_result, calculated_score, model)
+    if request is None:
+        return {}
+    try:
+        started = time.perf_counter()
+        response = await request["model"].generate_content_async(request["contents"], **request["kwargs"])
+        return parse_recommendation_reasons(request, response, started)
+    except Exception as e:
+        print(f"추천 이유 생성 실패: {e}")
+        return {}
+
+
+# ---------------------------------------
+# 5. 헬퍼 함수
+# ---------------------------------------
+def process_and_vault_questionnaire(data, evidence_hashes=None):
+    """설문 데이터 봉인 및 해시 생성 (증거 이미지 원본 해시 포함)"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
+    payload = dict(data, evidence_sha256=list(evidence_hashes)) if evidence_hashes else data
+    data_string = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    data_hash = hashlib.sha256(data_string.encode('utf-8')).hexdigest()
+    return {"hash": data_hash, "timestamp": timestamp, "evidence": list(evidence_hashes or [])}
+
+
+
+def build_dossier_info(answers):
+    """상대방 정보 요약 문자열을 생성합니다."""
+    return f"직업: {answers.get('dossier_job')}, 성향: {answers.get('dossier_personality')}"
+
+
+# ---------------------------------------
+# 6. 전체 파이프라인 (Headless)
+# ---------------------------------------
+def run_full_analysis(answers, model=None, agencies=None, evidence_parts=None):
+    """설문 응답 1건을 봉인 → 점수 계산 → AI 분석 → 파트너 추천까지 실행합니다."""
+    vault_info = process_and_vault_questionnaire(answers)
+    calculated_score = calculate_base_score(answers)
+    analysis_result = perform_ai_analysis(SERVICE_TYPE, build_dossier_info(answers), answers, calculated_score, evidence_parts, model=model)
+
+    recommended_agencies = []
+    recommendation_reasons = {}
+    # 점수가 40점 이상일 경우 파트너 추천 (app.py와 동일한 기준)
+    if calculated_score >= 40 and agencies:
+        recommended_agencies = get_weighted_unique_recommendations(agencies, k=3)
+        recommendation_reasons = generate_recommendation_reasons(recommended_agencies, analysis_result, calculated_score, model=model)
+
+    level_korean, _ = get_risk_level_korean(calculated_score)
+    return {
+        "vault_hash": vault_info["hash"],
+        "timestamp": vault_info["timestamp"],
+        "score": calculated_score,
+        "risk_level": level_korean,
+        "analysis": analysis_result,
+        "recommended_partners": [a["name"] for a in recommended_agencies],
+        "recommendation_reasons": recommendation_reasons,
+    }
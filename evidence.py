@@ -0,0 +1,119 @@
+# evidence.py (Reset Security - 증거 이미지 업로드 처리)
+import contextlib
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# ---------------------------------------
+# 0. 처리 한도 설정
+# ---------------------------------------
+
+# 업로드 허용 형식 및 개수
+ALLOWED_TYPES = ["jpg", "jpeg", "png", "webp"]
+MAX_FILES = 5
+MAX_FILE_BYTES = 25 * 1024 * 1024  # 20MB급 휴대폰 원본 사진까지 허용
+
+# 모델로 전송되는 이미지 한도 (긴 변 픽셀 / 인코딩 후 바이트)
+MAX_EDGE = 1280
+# draft를 쓸 수 없는 형식(PNG/WebP)은 전체 해상도로 디코딩되므로 픽셀 수 자체를 제한 (약 12MP, RGBA 기준 ~48MB)
+MAX_DECODE_PIXELS = 12_000_000
+MAX_FULL_DECODES = 1  # 병렬 처리 중에도 전체 해상도 PNG/WebP 디코딩은 한 번에 1장 (배치 최대 메모리 = 12MP 1장분)
+MIN_EDGE = 640
+MAX_ENCODED_BYTES = 350 * 1024
+JPEG_QUALITY_STEPS = (82, 72, 62, 52)
+
+HASH_CHUNK_SIZE = 64 * 1024
+MAX_WORKERS = 4
+
+_full_decode_slots = threading.BoundedSemaphore(MAX_FULL_DECODES)
+
+
+# ---------------------------------------
+# 1. 스트리밍 해시 (봉인용)
+# ---------------------------------------
+def hash_stream(fileobj, chunk_size=HASH_CHUNK_SIZE):
+    """파일 전체를 메모리에 올리지 않고 청크 단위로 SHA-256을 계산합니다."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    total = 0
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+        total += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), total
+
+
+# ---------------------------------------
+# 2. 축소 및 재인코딩 (EXIF 제거)
+# ---------------------------------------
+def _encode_jpeg(img, quality):
+    buffer = io.BytesIO()
+    # exif/icc_profile을 넘기지 않으므로 위치정보 등 메타데이터는 모두 제거됨
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def prepare_image(fileobj, max_edge=MAX_EDGE):
+    """이미지를 지연 디코딩으로 축소한 뒤, 한도 이하 크기의 JPEG로 재인코딩합니다."""
+    with Image.open(fileobj) as img:
+        # draft: JPEG은 DCT 단계에서 1/2~1/8 해상도로 바로 디코딩 (원본 픽셀 전체를 메모리에 올리지 않음)
+        full_decode = img.format not in ("JPEG", "MPO")
+        if not full_decode:
+            scale = min(max_edge / img.width, max_edge / img.height, 1.0)
+            img.draft("RGB", (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+        elif img.width * img.height > MAX_DECODE_PIXELS:
+            # PNG/WebP는 draft가 없어 원본 전체가 디코딩되므로, 헤더만 읽은 지금 거부
+            raise ValueError(f"too many pixels to decode: {img.width}x{img.height} {img.format}")
+        # thumbnail: 디코딩된 이미지에 reduce()를 먼저 적용한 뒤 리샘플링 (PNG/WebP의 디코딩 메모리는 줄이지 못함)
+        with _full_decode_slots if full_decode else contextlib.nullcontext():
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        # 휴대폰 사진의 회전 정보는 픽셀에 반영한 뒤 EXIF는 버림
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        edge = max_edge
+        while True:
+            for quality in JPEG_QUALITY_STEPS:
+                data = _encode_jpeg(img, quality)
+                if len(data) <= MAX_ENCODED_BYTES:
+                    return {"data": data, "mime_type": "image/jpeg", "size": img.size}
+            if edge <= MIN_EDGE:
+                # 최소 해상도에서도 초과하면 마지막 결과를 그대로 사용 (노이즈가 극단적인 경우)
+                return {"data": data, "mime_type": "image/jpeg", "size": img.size}
+            edge = max(MIN_EDGE, int(edge * 0.75))
+            img.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+
+
+def process_evidence_file(uploaded_file):
+    """업로드 파일 1개를 해시 → 축소/재인코딩합니다. 실패 시 None."""
+    name = getattr(uploaded_file, "name", "evidence")
+    try:
+        file_hash, original_bytes = hash_stream(uploaded_file)
+        if original_bytes > MAX_FILE_BYTES:
+            print(f"Evidence skipped (too large): {name} {original_bytes} bytes")
+            return None
+        prepared = prepare_image(uploaded_file)
+        prepared.update({"name": name, "sha256": file_hash, "original_bytes": original_bytes})
+        return prepared
+    except Exception as e:
+        print(f"Evidence processing failed ({name}): {e}")
+        return None
+
+
+def process_evidence_batch(uploaded_files, max_workers=MAX_WORKERS):
+    """여러 장의 이미지를 스레드 풀에서 병렬 처리합니다. (Pillow 디코딩/리샘플링은 GIL을 해제)"""
+    files = list(uploaded_files or [])[:MAX_FILES]
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        results = list(executor.map(process_evidence_file, files))
+    return [r for r in results if r]
+
+
+def to_model_parts(evidence_items):
+    """Gemini 멀티모달 입력 형식({mime_type, data})으로 변환합니다."""
+    return [{"mime_type": item["mime_type"], "data": item["data"]} for item in evidence_items]
@@ -0,0 +1,170 @@
+# lead_index.py (Reset Security - 로컬 리드 인덱스)
+# Google Sheets를 읽지 않고도 중복 신청 여부를 확인할 수 있도록, 접수된 리드의
+# (vault hash, 정규화된 연락처)를 로컬 SQLite에 기록합니다.
+#
+# 기록은 두 단계입니다: claim()이 'pending'으로 선점하고, 시트 저장이 성공하면 confirm()으로
+# 'confirmed'가 됩니다. 저장 도중 프로세스가 죽어 남은 pending 기록은 PENDING_TTL_SEC 후 무효가 되어
+# 재신청이 가능해집니다. (중복 신청 차단은 pending/confirmed 모두 적용)
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+LEAD_INDEX_PATH = os.environ.get("RESET_LEAD_INDEX_PATH", os.path.join(".cache", "lead_index.sqlite3"))
+PENDING_TTL_SEC = 300  # 시트 저장 1건의 최대 소요 시간보다 넉넉하게
+
+# Google Sheets 헤더 (app.py의 save_lead_to_google_sheets와 동일)
+SHEET_PHONE_COLUMN = "Phone"
+SHEET_HASH_COLUMN = "Vault Hash"
+
+
+def normalize_phone(phone):
+    """연락처를 숫자만 남기고 국가번호(+82)를 국내 형식(0…)으로 통일합니다."""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if digits.startswith("82") and len(digits) >= 11:
+        digits = "0" + digits[2:]
+    return digits
+
+
+# ---------------------------------------
+# 1. 인덱스
+# ---------------------------------------
+class LeadIndex:
+    """(vault hash, 연락처) 기준 리드 인덱스. 여러 워커 프로세스가 같은 파일을 공유할 수 있습니다."""
+
+    def __init__(self, path=LEAD_INDEX_PATH, pending_ttl_sec=PENDING_TTL_SEC):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.pending_ttl_sec = pending_ttl_sec
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leads ("
+            " vault_hash TEXT NOT NULL, phone TEXT NOT NULL, created_at REAL NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'confirmed', PRIMARY KEY (vault_hash, phone)) WITHOUT ROWID"
+        )
+        # status 컬럼 이전 버전의 인덱스: 기존 기록은 모두 시트 저장이 끝난 것으로 간주
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(leads)")]
+        if "status" not in columns:
+            self._conn.execute("ALTER TABLE leads ADD COLUMN status TEXT NOT NULL DEFAULT 'confirmed'")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _incr(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def claim(self, vault_hash, phone):
+        """새 리드면 pending으로 선점 후 True, 이미 접수(또는 저장 중)인 리드면 False (Sheets 쓰기 생략 대상)."""
+        key = (str(vault_hash), normalize_phone(phone))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 저장 도중 중단된 선점은 넘겨받음
+                self._conn.execute(
+                    "DELETE FROM leads WHERE vault_hash = ? AND phone = ? AND status = 'pending' AND created_at < ?",
+                    key + (now - self.pending_ttl_sec,),
+                )
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO leads (vault_hash, phone, created_at, status) VALUES (?, ?, ?, 'pending')",
+                    key + (now,),
+                )
+                claimed = cursor.rowcount == 1
+                if not claimed:
+                    self._incr("suppressed")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not claimed:
+            metrics.incr("leads.suppressed")
+        return claimed
+
+    def confirm(self, vault_hash, phone):
+        """Sheets 저장이 성공한 선점을 확정합니다."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE leads SET status = 'confirmed' WHERE vault_hash = ? AND phone = ?",
+                (str(vault_hash), normalize_phone(phone)),
+            )
+
+    def release(self, vault_hash, phone):
+        """Sheets 저장이 실패한 경우 선점을 취소하여 재시도가 가능하게 합니다."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM leads WHERE vault_hash = ? AND phone = ? AND status = 'pending'",
+                (str(vault_hash), normalize_phone(phone)),
+            )
+
+    def release_stale(self):
+        """시작 시 호출: 이전 프로세스가 확정하지 못하고 남긴 오래된 선점을 정리합니다."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM leads WHERE status = 'pending' AND created_at < ?",
+                (time.time() - self.pending_ttl_sec,),
+            )
+        return cursor.rowcount
+
+    def contains(self, vault_hash, phone):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM leads WHERE vault_hash = ? AND phone = ?",
+                (str(vault_hash), normalize_phone(phone)),
+            ).fetchone()
+        return row is not None
+
+    def count(self):
+        """확정된 리드 수 (저장 중인 선점 제외)."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leads WHERE status = 'confirmed'").fetchone()[0]
+
+    def suppressed(self):
+        """지금까지 생략된 중복 쓰기 횟수 (재시작 후에도 유지)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM counters WHERE name = 'suppressed'").fetchone()
+        return row[0] if row else 0
+
+    def rebuild_from_rows(self, rows):
+        """시트 전체 값(get_all_values 1회 호출 결과)으로 확정 기록을 다시 만듭니다. (저장 중인 선점은 유지)"""
+        rows = list(rows)
+        if not rows:
+            return 0
+        header = rows[0]
+        try:
+            phone_col = header.index(SHEET_PHONE_COLUMN)
+            hash_col = header.index(SHEET_HASH_COLUMN)
+        except ValueError:
+            print(f"Lead index rebuild skipped: unexpected sheet header {header}")
+            return 0
+
+        now = time.time()
+        entries = [
+            (row[hash_col], normalize_phone(row[phone_col]), now)
+            for row in rows[1:]
+            if len(row) > max(phone_col, hash_col) and row[hash_col] and row[phone_col]
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM leads WHERE status = 'confirmed'")
+                # 시트에 이미 있는 선점은 저장이 끝난 것이므로 확정으로 전환
+                self._conn.executemany(
+                    "INSERT INTO leads (vault_hash, phone, created_at, status) VALUES (?, ?, ?, 'confirmed')"
+                    " ON CONFLICT(vault_hash, phone) DO UPDATE SET status = 'confirmed'",
+                    entries,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(entries)
@@ -0,0 +1,38 @@
+# metrics.py (Reset Security - 프로세스 단위 운영 지표)
+import threading
+
+# ---------------------------------------
+# 카운터 (스레드 안전, 프로세스 전역)
+# ---------------------------------------
+_lock = threading.Lock()
+_counters = {}
+_observations = {}
+
+
+def incr(name, amount=1):
+    """카운터를 증가시킵니다."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, value):
+    """지연 시간·비용 등 관측값을 누적합니다. (건수/합계/최댓값)"""
+    with _lock:
+        stat = _observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+        stat["count"] += 1
+        stat["sum"] += value
+        stat["max"] = max(stat["max"], value)
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    """현재 지표를 이름순 dict로 반환합니다. (운영자 패널 표시용)"""
+    with _lock:
+        result = dict(_counters)
+        for name, stat in _observations.items():
+            result[name] = {"count": stat["count"], "avg": round(stat["sum"] / stat["count"], 6), "max": round(stat["max"], 6)}
+    return dict(sorted(result.items()))
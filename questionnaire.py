@@ -0,0 +1,95 @@
+# questionnaire.py (Reset Security - 5단계 설문 정의)
+# Streamlit 입력 단계(app.py), 정적 설문 페이지(index.html), 분석 API(api.py)가 모두 이 정의로 문항을 렌더링/검증합니다.
+# 응답 옵션 문자열은 engine.calculate_base_score의 점수 매핑 키와 일치해야 합니다.
+
+OPTIONS_BASIC_YN = ["아니오", "가끔 그렇다", "예"]
+OPTIONS_YN = ["아니오", "예"]
+
+MAX_TEXT_LENGTH = {"text": 100, "textarea": 2000}
+
+# ---------------------------------------
+# 0. 설문 단계 정의
+# ---------------------------------------
+QUESTION_STEPS = [
+    {
+        "title": "상대방 기본 정보",
+        "questions": [
+            {"key": "dossier_job", "type": "text", "label": "상대방 직업 (예: 회사원, 자영업, 전문직)"},
+            {"key": "dossier_personality", "type": "text", "label": "상대방 성향 (예: 내성적, 외향적, 꼼꼼함)"},
+        ],
+    },
+    {
+        "title": "일상 및 행동 변화",
+        "description": "최근 3개월 기준으로 응답해주세요.",
+        "questions": [
+            {"key": "behavior_q1_schedule", "label": "Q1. 외출/귀가 시간이 불규칙하거나 잦아졌는가?", "options": OPTIONS_BASIC_YN},
+            {"key": "behavior_q2_weekend", "label": "Q2. 주말/휴일 단독 외출이 잦아졌는가?", "options": OPTIONS_BASIC_YN},
+            {"key": "behavior_q3_appearance", "label": "Q3. 외모 관리에 대한 관심이 과도하게 늘었는가?", "options": OPTIONS_BASIC_YN},
+            {"key": "other_q16_specific_day", "label": "Q4. 특정 요일/시간대에 자주 연락이 두절되는가?", "options": OPTIONS_YN},
+        ],
+    },
+    {
+        "title": "휴대폰 사용 및 소통 변화",
+        "questions": [
+            {"key": "comm_q4_phone_habit", "label": "Q5. 휴대폰 잠금을 강화하거나 숨기는 행동이 있는가?", "options": OPTIONS_YN},
+            {"key": "phone_q7_voicemail", "label": "Q6. 전화를 한 번에 받지 않는 횟수가 늘었는가?", "options": OPTIONS_YN},
+            {"key": "phone_q8_call_rejection", "label": "Q7. 전화를 거절하거나 받지 않는 횟수가 늘었는가?", "options": OPTIONS_YN},
+            {"key": "phone_q9_silent_call", "label": "Q8. 항상 조용한 곳에서만 통화하려 하는가?", "options": OPTIONS_YN},
+            {"key": "comm_q10_katalk", "label": "Q9. 카톡 알림이 무음이거나, 카톡 시 평소와 다른 표정을 보이는가?", "options": OPTIONS_YN},
+        ],
+    },
+    {
+        "title": "관계 및 태도 변화",
+        "questions": [
+            {"key": "comm_q5_attitude", "label": "Q10. 대화 시 방어적이거나 짜증/화가 늘었는가?", "options": OPTIONS_BASIC_YN},
+            {"key": "comm_q6_intimacy", "label": "Q11. 스킨십이나 성관계 횟수가 50% 이상 줄었는가?", "options": OPTIONS_YN},
+            {"key": "comm_q15_intimacy_style", "label": "Q12. 성관계 시간이 현저하게 줄었거나, 평소와 다른 요구가 늘었는가?", "options": ["변화 없음", "시간 감소", "요구사항 변화"]},
+            {"key": "routine_q11_bathroom", "label": "Q13. 화장실 체류 시간이 길어지거나, 집에서 씻는 빈도/시간이 줄었는가?", "options": OPTIONS_YN},
+            {"key": "routine_q12_sleep_phone", "label": "Q14. 잠 잘 때 휴대폰을 손에 쥐거나 머리맡에 두고 자는가?", "options": OPTIONS_YN},
+        ],
+    },
+    {
+        "title": "차량 및 기타 정황",
+        "questions": [
+            {"key": "vehicle_q13_cleanliness", "label": "Q15. 평소 지저분하던 차량 실내외가 깨끗해졌는가?", "options": OPTIONS_YN},
+            {"key": "vehicle_q14_bluetooth", "label": "Q16. 동승 시 차량 블루투스 연결을 꺼리는가?", "options": OPTIONS_YN},
+            {"key": "finance_q15_spending", "label": "Q17. 설명할 수 없는 지출(휴대폰 요금 증가, 현금 사용)이 늘었는가?", "options": OPTIONS_YN},
+            {"key": "other_q17_physical_evidence", "label": "Q18. 물리적인 증거(사진, 카톡 캡처, 영수증 등)를 확보했는가?", "options": ["아니오 (심증만 있음)", "약간 확보함", "결정적 증거 확보함"]},
+            {"key": "evidence_q9_freetext", "type": "textarea", "label": "추가 정보 (선택사항)", "placeholder": "분석에 도움이 될 추가 정보가 있다면 자유롭게 작성해주세요."},
+        ],
+    },
+]
+
+
+# ---------------------------------------
+# 1. 응답 검증
+# ---------------------------------------
+def iter_questions():
+    for step in QUESTION_STEPS:
+        yield from step["questions"]
+
+
+def validate_answers(payload):
+    """외부에서 받은 응답을 설문 정의로 검증합니다. (정리된 answers, 오류 목록)을 반환합니다.
+
+    선택형 문항은 정의된 옵션 값만 허용하고(미응답 시 첫 번째 옵션, Streamlit 라디오 기본값과 동일),
+    텍스트 문항은 길이를 제한합니다. 정의에 없는 키는 버립니다.
+    """
+    if not isinstance(payload, dict):
+        return {}, ["answers must be a JSON object"]
+    answers, errors = {}, []
+    for question in iter_questions():
+        key = question["key"]
+        value = payload.get(key)
+        options = question.get("options")
+        if options:
+            if value is None:
+                value = options[0]
+            if value not in options:
+                errors.append(f"{key}: invalid option")
+                continue
+        else:
+            value = "" if value is None else str(value).strip()
+            value = value[:MAX_TEXT_LENGTH.get(question.get("type"), 100)]
+        answers[key] = value
+    return answers, errors
@@ -0,0 +1,140 @@
+# quota.py (Reset Security - 방문자별 AI 분석 할당량 및 봇 필터)
+# 방문자(신뢰하는 프록시가 전달한 클라이언트 주소 + 브라우저 지문)마다 토큰 버킷으로 AI 분석 횟수를 제한합니다.
+# 버킷은 로컬 SQLite에 저장되어 같은 서버의 여러 워커 프로세스가 함께 사용합니다.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+QUOTA_PATH = os.environ.get("RESET_QUOTA_PATH", os.path.join(".cache", "quota.sqlite3"))
+
+DEFAULT_CAPACITY = 3            # 방문자당 연속 허용 분석 수
+DEFAULT_REFILL_PER_HOUR = 6.0   # 시간당 회복되는 분석 수 (10분에 1회)
+
+# 앱 앞단의 신뢰하는 리버스 프록시 수. X-Forwarded-For의 앞쪽 값은 클라이언트가 임의로 넣을 수 있으므로
+# 오른쪽에서 이 수만큼 떨어진 값(가장 바깥 프록시가 직접 본 주소)만 사용합니다. 0이면 헤더를 무시.
+TRUSTED_PROXY_HOPS = int(os.environ.get("RESET_TRUSTED_PROXY_HOPS", 1))
+
+# 자동화 도구/크롤러 User-Agent (대소문자 무시)
+BOT_USER_AGENT_PATTERN = re.compile(
+    r"bot|crawl|spider|slurp|scrap|headless|phantomjs|selenium|puppeteer|playwright|"
+    r"curl|wget|httpie|python-requests|python-urllib|aiohttp|httpx|go-http-client|java/|okhttp|libwww|node-fetch|axios",
+    re.IGNORECASE,
+)
+
+
+# ---------------------------------------
+# 1. 방문자 식별 및 봇 판별
+# ---------------------------------------
+def client_address(headers, peer=None, trusted_hops=TRUSTED_PROXY_HOPS):
+    """신뢰하는 프록시가 기록한 클라이언트 주소. 확인할 수 없으면 연결 상대 주소(peer)."""
+    forwarded = [part.strip() for part in (headers.get("X-Forwarded-For") or "").split(",") if part.strip()]
+    if trusted_hops > 0 and len(forwarded) >= trusted_hops:
+        return forwarded[-trusted_hops]
+    return peer or "unknown"
+
+
+def visitor_key(headers, peer=None):
+    """클라이언트 주소 + User-Agent + Accept-Language로 방문자 키를 만듭니다. (원본 주소는 저장하지 않음)"""
+    fingerprint = "|".join([
+        client_address(headers, peer),
+        headers.get("User-Agent", ""),
+        headers.get("Accept-Language", ""),
+    ])
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]
+
+
+def is_probable_bot(user_agent):
+    """User-Agent가 비어 있거나 자동화 도구로 보이면 True."""
+    user_agent = (user_agent or "").strip()
+    return not user_agent or bool(BOT_USER_AGENT_PATTERN.search(user_agent))
+
+
+# ---------------------------------------
+# 2. 토큰 버킷 저장소
+# ---------------------------------------
+class VisitorQuota:
+    """방문자 키별 토큰 버킷. 차감은 SQLite 트랜잭션 안에서 이루어져 워커 간에도 원자적입니다."""
+
+    def __init__(self, path=QUOTA_PATH, capacity=DEFAULT_CAPACITY, refill_per_hour=DEFAULT_REFILL_PER_HOUR):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.capacity = max(1.0, float(capacity))
+        self.refill_per_sec = max(0.0, float(refill_per_hour)) / 3600
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " visitor TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def incr(self, name):
+        """워커 간 공유되는 누적 카운터를 증가시킵니다. (재시작 후에도 유지)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                (name,),
+            )
+        metrics.incr(f"quota.{name}")
+
+    def counter(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def try_acquire(self, visitor):
+        """토큰 1개를 차감할 수 있으면 True, 할당량을 초과했으면 False."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE visitor = ?", (visitor,)).fetchone()
+                tokens = self.capacity
+                if row:
+                    tokens = min(self.capacity, row[0] + max(0.0, now - row[1]) * self.refill_per_sec)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self._conn.execute(
+                    "INSERT INTO buckets (visitor, tokens, updated) VALUES (?, ?, ?)"
+                    " ON CONFLICT(visitor) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (visitor, tokens, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._prune(now)
+        return allowed
+
+    def remaining(self, visitor):
+        """현재 남은 토큰 수 (운영 확인용)."""
+        with self._lock:
+            row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE visitor = ?", (visitor,)).fetchone()
+        if not row:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, time.time() - row[1]) * self.refill_per_sec)
+
+    def visitors(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def _prune(self, now, interval=600):
+        """가득 찬 상태로 회복된 버킷은 새 방문자와 같으므로 주기적으로 삭제합니다."""
+        if now - self._last_prune < interval or not self.refill_per_sec:
+            return
+        self._last_prune = now
+        full_after = self.capacity / self.refill_per_sec
+        with self._lock:
+            self._conn.execute("DELETE FROM buckets WHERE updated < ?", (now - full_after,))
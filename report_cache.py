@@ -0,0 +1,151 @@
+# report_cache.py (Reset Security - 최근 AI 리포트 캐시)
+# 같은 설문(vault hash)에 대한 AI 분석 결과를 로컬 SQLite에 보관하여, 재제출이나
+# 할당량 초과 시 LLM을 다시 호출하지 않고 재사용합니다. (여러 워커 프로세스가 공유)
+# 정적 설문 페이지의 제출 결과도 api.py 쪽에 함께 보관합니다. (SubmissionStore)
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+REPORT_CACHE_PATH = os.environ.get("RESET_REPORT_CACHE_PATH", os.path.join(".cache", "report_cache.sqlite3"))
+MAX_ENTRIES = 5000
+TTL_SEC = 24 * 3600
+TOKEN_BYTES = 18  # 제출 조회 토큰 (base64url 24자)
+
+
+# ---------------------------------------
+# 1. 캐시
+# ---------------------------------------
+class ReportCache:
+    """vault hash → AI 분석 결과(dict). 오래된 항목부터 삭제하여 최대 max_entries개를 유지합니다."""
+
+    def __init__(self, path=REPORT_CACHE_PATH, max_entries=MAX_ENTRIES, ttl_sec=TTL_SEC):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " vault_hash TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_created_at ON reports (created_at)")
+
+    def get(self, vault_hash):
+        """유효 기간 내 결과가 있으면 dict, 없으면 None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM reports WHERE vault_hash = ? AND created_at >= ?",
+                (str(vault_hash), time.time() - self.ttl_sec),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, vault_hash, result):
+        """AI 분석 성공 결과만 저장합니다. (폴백/오류 결과는 캐시하지 않음)"""
+        if not isinstance(result, dict) or result.get("fallback") or "error" in result:
+            return False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (vault_hash, result, created_at) VALUES (?, ?, ?)",
+                (str(vault_hash), json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM reports WHERE vault_hash IN ("
+                " SELECT vault_hash FROM reports ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        return True
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+
+# ---------------------------------------
+# 2. 외부 제출 저장소 (정적 설문 페이지 → api.py → Streamlit 리포트)
+# ---------------------------------------
+class SubmissionStore:
+    """api.py가 받은 설문 제출(응답/점수/결과)을 추측할 수 없는 임의 토큰으로 보관합니다.
+
+    vault hash는 응답 조합으로 결정되어 열거할 수 있으므로 조회 키로 쓰지 않습니다. AI 분석이 지연
+    예산 안에 끝나지 않은 제출은 'pending'으로 저장했다가 완료 시 complete()로 결과를 채웁니다.
+    Streamlit 리포트는 이 저장소를 직접 읽지 않고 api.py의 GET /api/report/<token>으로 조회합니다.
+    """
+
+    def __init__(self, path=REPORT_CACHE_PATH, ttl_sec=TTL_SEC):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # vault hash를 키로 쓰던 이전 테이블은 버림 (24시간 보관분)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(submissions)")]
+        if columns and "token" not in columns:
+            self._conn.execute("DROP TABLE submissions")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " token TEXT PRIMARY KEY, vault_hash TEXT NOT NULL, answers TEXT NOT NULL, score INTEGER NOT NULL,"
+            " timestamp TEXT NOT NULL, status TEXT NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        # 이미 제출에 사용된 설문 시작 시각 토큰 (재사용하여 최소 소요 시간 검사를 우회하지 못하도록)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS used_starts (start_token TEXT PRIMARY KEY, used_at REAL NOT NULL) WITHOUT ROWID")
+
+    def create(self, vault_info, answers, score, result, pending=False):
+        """제출을 저장하고 조회 토큰을 반환합니다."""
+        token = secrets.token_urlsafe(TOKEN_BYTES)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO submissions (token, vault_hash, answers, score, timestamp, status, result, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (token, vault_info["hash"], json.dumps(answers, ensure_ascii=False), int(score), vault_info["timestamp"],
+                 "pending" if pending else "done", json.dumps(result, ensure_ascii=False), now),
+            )
+            self._conn.execute("DELETE FROM submissions WHERE created_at < ?", (now - self.ttl_sec,))
+        return token
+
+    def claim_start(self, start_token):
+        """설문 시작 시각 토큰을 사용 처리합니다. 처음 사용이면 True, 이미 사용된 토큰이면 False."""
+        now = time.time()
+        with self._lock:
+            claimed = self._conn.execute(
+                "INSERT OR IGNORE INTO used_starts (start_token, used_at) VALUES (?, ?)", (str(start_token), now)
+            ).rowcount == 1
+            self._conn.execute("DELETE FROM used_starts WHERE used_at < ?", (now - self.ttl_sec,))
+        return claimed
+
+    def complete(self, token, result):
+        """지연 예산 초과로 pending이던 제출에 최종 결과를 채웁니다."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE submissions SET status = 'done', result = ? WHERE token = ?",
+                (json.dumps(result, ensure_ascii=False), str(token)),
+            )
+
+    def get(self, token):
+        """유효 기간 내 제출이 있으면 {status, vault_info, answers, score, result}, 없으면 None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vault_hash, answers, score, timestamp, status, result FROM submissions"
+                " WHERE token = ? AND created_at >= ?",
+                (str(token), time.time() - self.ttl_sec),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "status": row[4],
+            "vault_info": {"hash": row[0], "timestamp": row[3], "evidence": []},
+            "answers": json.loads(row[1]),
+            "score": row[2],
+            "result": json.loads(row[5]),
+        }
@@ -0,0 +1,125 @@
+# rerun_profiler.py (Reset Security - 운영자 전용 rerun 프로파일러)
+import cProfile
+import hmac
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# ---------------------------------------
+# 0. 설정
+# ---------------------------------------
+
+# 프로파일 결과 저장 위치 (환경 변수로 변경 가능)
+PROFILE_DIR = os.environ.get("RESET_PROFILE_DIR", "profiles")
+
+# 로컬 디버깅용 환경 플래그: "1"이면 모든 세션의 rerun을 프로파일링
+PROFILE_ENV_FLAG = "RESET_PROFILE"
+
+# tracemalloc 스냅샷에 기록할 상위 할당 지점 수
+TRACEMALLOC_TOP_N = 30
+
+# 프로세스 내 동시 프로파일링은 1개 rerun만 허용
+# (Python 3.12+의 cProfile은 프로세스 전역인 sys.monitoring을 사용하여 중복 enable 시 ValueError)
+_profiler_lock = threading.Lock()
+
+
+# ---------------------------------------
+# 1. 활성화 판단 (비활성 시 오버헤드 없음)
+# ---------------------------------------
+def check_ops_param(query_params, name, get_ops_token):
+    """운영자 전용 쿼리 파라미터(?<name>=<토큰>)가 올바른 토큰인지 확인합니다."""
+    # 파라미터가 없으면 시크릿 조회 없이 바로 종료 (일반 방문자 경로)
+    supplied = query_params.get(name)
+    if not supplied:
+        return False
+    ops_token = get_ops_token()
+    if not ops_token:
+        return False
+    return hmac.compare_digest(str(supplied), str(ops_token))
+
+
+def is_profiling_requested(query_params, get_ops_token):
+    """쿼리 파라미터(?profile=<토큰>) 또는 환경 플래그로 프로파일링 여부를 판단합니다."""
+    if os.environ.get(PROFILE_ENV_FLAG) == "1":
+        return True
+    return check_ops_param(query_params, "profile", get_ops_token)
+
+
+def is_memory_tracing_requested(query_params):
+    """?mem=1 이 함께 전달되면 tracemalloc 스냅샷도 기록합니다."""
+    return os.environ.get(PROFILE_ENV_FLAG + "_MEM") == "1" or query_params.get("mem") == "1"
+
+
+# ---------------------------------------
+# 2. 프로파일러 컨텍스트
+# ---------------------------------------
+def _profile_path(session_id, suffix):
+    safe_session = re.sub(r"[^A-Za-z0-9_-]", "", str(session_id))[:32] or "anon"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILE_DIR, f"{stamp}_{safe_session}{suffix}")
+
+
+@contextmanager
+def rerun_profiler(enabled, session_id, trace_memory=False):
+    """스크립트 1회 실행(rerun)을 cProfile로 감싸고 결과를 파일로 저장합니다.
+
+    st.rerun()은 예외로 스크립트를 중단시키므로, 저장은 finally에서 처리합니다.
+    다른 세션이 이미 프로파일링 중이면 이번 rerun은 측정 없이 그대로 실행합니다.
+    Python 3.11 이하의 cProfile은 현재 스레드만 측정하지만, 3.12+에서는 프로세스 전역으로
+    동작하므로 같은 시간대 다른 세션 스레드의 호출이 결과에 섞일 수 있습니다.
+    """
+    if not enabled:
+        yield
+        return
+
+    if not _profiler_lock.acquire(blocking=False):
+        print(f"[profile] session={session_id} skipped: another rerun is being profiled")
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.enable()
+    except Exception as e:
+        # 다른 프로파일링 도구(디버거/커버리지 등)가 이미 활성화된 경우
+        _profiler_lock.release()
+        print(f"[profile] session={session_id} skipped: {e}")
+        yield
+        return
+
+    # tracemalloc은 프로세스 전역이므로, 이미 켜져 있으면 건드리지 않음
+    started_tracing = False
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiler_lock.release()
+        elapsed = time.perf_counter() - started
+        try:
+            prof_path = _profile_path(session_id, ".prof")
+            profiler.dump_stats(prof_path)
+
+            if trace_memory and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                with open(_profile_path(session_id, "_mem.txt"), "w", encoding="utf-8") as f:
+                    f.write(f"elapsed={elapsed:.3f}s current={current} peak={peak}\n")
+                    for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP_N]:
+                        f.write(f"{stat}\n")
+
+            print(f"[profile] session={session_id} elapsed={elapsed:.3f}s -> {prof_path}")
+        except Exception as e:
+            print(f"Profile dump failed: {e}")
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
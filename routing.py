@@ -0,0 +1,129 @@
+# routing.py (Reset Security - 위험 단계별 모델 라우팅 정책)
+# calculate_base_score 결과의 위험 단계(get_risk_level_korean)에 따라
+# 모델 등급, 출력 토큰 한도, 생성할 스키마 섹션, 파트너 추천 이유 생성 여부를 정합니다.
+import copy
+import json
+import math
+import os
+
+# ---------------------------------------
+# 0. 스키마 섹션 및 모델 단가
+# ---------------------------------------
+ALL_SECTIONS = ["risk_assessment", "deep_analysis", "litigation_readiness", "golden_time", "the_dossier", "the_war_room"]
+
+# 항상 포함되어야 하는 섹션 (리포트 상단 요약과 증거 현황)
+REQUIRED_SECTIONS = ["risk_assessment", "litigation_readiness"]
+
+# 섹션별 예상 출력 토큰 (한글 응답 기준). JSON 모드 응답은 max_output_tokens에서 잘리면 파싱에
+# 실패하여 폴백 리포트가 되므로, 정책에 한도를 지정하지 않은 단계는 선택한 섹션 합계에 여유분을 곱해 정합니다.
+SECTION_OUTPUT_TOKENS = {
+    "risk_assessment": 320, "deep_analysis": 480, "litigation_readiness": 220,
+    "golden_time": 90, "the_dossier": 220, "the_war_room": 330,
+}
+OUTPUT_TOKEN_HEADROOM = 1.5
+
+# 1M 토큰당 USD (입력, 출력) - 비용 추정용
+MODEL_PRICES_PER_1M = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+}
+
+# ---------------------------------------
+# 1. 기본 정책
+# ---------------------------------------
+# model이 None이면 LLM 호출 없이 로컬(점수 기반) 리포트를 사용
+# max_output_tokens를 생략하면 sections로 계산 (output_token_budget), None이면 제한 없음
+DEFAULT_ROUTING_POLICY = {
+    "안정 단계": {
+        "model": "gemini-2.0-flash-lite",
+        "sections": ["risk_assessment", "litigation_readiness", "golden_time"],
+        "partner_reasons": False,
+    },
+    "주의 단계": {
+        "model": "gemini-2.0-flash-lite",
+        "sections": ["risk_assessment", "deep_analysis", "litigation_readiness", "golden_time", "the_war_room"],
+        "partner_reasons": True,
+        "reasons_model": "gemini-2.0-flash-lite",
+        "reasons_max_output_tokens": 400,
+    },
+    "위험 단계": {
+        "model": "gemini-2.0-flash",
+        "sections": ALL_SECTIONS,
+        "partner_reasons": True,
+        "reasons_model": "gemini-2.0-flash-lite",
+        "reasons_max_output_tokens": 400,
+    },
+    "심각 단계": {
+        "model": "gemini-2.0-flash",
+        "sections": ALL_SECTIONS,
+        "partner_reasons": True,
+        "reasons_model": "gemini-2.0-flash",
+        "reasons_max_output_tokens": 500,
+    },
+}
+
+# 라우팅 도입 이전 동작 (모든 단계 동일: flash + 전체 스키마 + 추천 이유) - 비교 기준
+LEGACY_ROUTING_POLICY = {
+    band: {"model": "gemini-2.0-flash", "max_output_tokens": None, "sections": ALL_SECTIONS,
+           "partner_reasons": True, "reasons_model": "gemini-2.0-flash", "reasons_max_output_tokens": None}
+    for band in DEFAULT_ROUTING_POLICY
+}
+
+_policy = copy.deepcopy(DEFAULT_ROUTING_POLICY)
+
+
+# ---------------------------------------
+# 2. 정책 설정 및 선택
+# ---------------------------------------
+def configure(overrides):
+    """단계별 설정을 기본 정책 위에 덮어씁니다. (dict 또는 JSON 문자열)"""
+    global _policy
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides)
+    policy = copy.deepcopy(DEFAULT_ROUTING_POLICY)
+    for band, route in (overrides or {}).items():
+        if band not in policy:
+            print(f"Unknown routing band ignored: {band}")
+            continue
+        policy[band].update(dict(route))
+    _policy = policy
+    return _policy
+
+
+def set_policy(policy):
+    """정책 전체를 교체합니다. (벤치마크 비교용)"""
+    global _policy
+    _policy = copy.deepcopy(policy)
+
+
+def output_token_budget(sections):
+    """섹션 예상 출력 토큰 합계 × 여유분 (100 단위 올림)."""
+    wanted = sum(SECTION_OUTPUT_TOKENS.get(name, 0) for name in sections)
+    return int(math.ceil(wanted * OUTPUT_TOKEN_HEADROOM / 100) * 100)
+
+
+def select_route(band):
+    """위험 단계에 해당하는 라우팅 설정을 반환합니다."""
+    route = dict(_policy.get(band) or DEFAULT_ROUTING_POLICY["심각 단계"])
+    sections = route.get("sections") or ALL_SECTIONS
+    route["sections"] = [s for s in ALL_SECTIONS if s in sections or s in REQUIRED_SECTIONS]
+    if "max_output_tokens" not in route:
+        route["max_output_tokens"] = output_token_budget(route["sections"])
+    route["band"] = band
+    route.setdefault("reasons_model", route.get("model"))
+    return route
+
+
+def estimate_cost(model_name, input_tokens, output_tokens):
+    """토큰 수로 호출 비용(USD)을 추정합니다. 단가를 모르면 0."""
+    price_in, price_out = MODEL_PRICES_PER_1M.get(model_name, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+# 환경 변수로 정책 파일 지정 시 적용 (예: RESET_ROUTING_POLICY=routing_policy.json)
+if os.environ.get("RESET_ROUTING_POLICY"):
+    try:
+        with open(os.environ["RESET_ROUTING_POLICY"], encoding="utf-8") as f:
+            configure(json.load(f))
+    except Exception as e:
+        print(f"Routing policy load failed: {e}")
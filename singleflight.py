@@ -0,0 +1,70 @@
+# singleflight.py (Reset Security - 동일 요청 병합 실행)
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 1회 실행으로 병합합니다.
+
+    먼저 들어온 호출(leader)만 fn을 executor에 제출하고, 실행 중에 들어온 호출은 같은 Future를 받아
+    결과(또는 예외)를 공유합니다. 실행이 끝나면 키를 비우므로 결과를 캐시하지는 않습니다.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def submit(self, key, fn, executor, gate=None):
+        """fn을 executor에서 실행하고 Future를 반환합니다. 같은 키가 실행 중이면 그 Future를 공유합니다.
+
+        gate가 있으면 leader만 실행 전에 gate()를 호출하며, None이 아닌 값을 반환하면 fn을 실행하지 않고
+        그 값을 결과로 공유합니다. (실행 중인 호출에 합류하는 쪽은 gate를 거치지 않음)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                # 키를 먼저 선점해 두고 gate/제출은 잠금 밖에서 (gate는 SQLite 등 블로킹 호출일 수 있음)
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            metrics.incr(f"{self.name}.coalesced")
+            return future
+
+        future.add_done_callback(lambda f: self._forget(key, f))
+        try:
+            gated = gate() if gate else None
+            if gated is not None:
+                future.set_result(gated)
+                return future
+            inner = executor.submit(fn)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        metrics.incr(f"{self.name}.executed")
+        inner.add_done_callback(lambda f: self._settle(future, f))
+        return future
+
+    @staticmethod
+    def _settle(future, inner):
+        if future.cancelled():
+            return
+        if inner.cancelled():
+            future.cancel()
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)